@@ -1,64 +1,182 @@
 import os
-import json
-import argparse
+import sys
+from functools import lru_cache
+
+REQUIRED_KEYS = ("GOOGLE_API_KEY", "GOOGLE_CSE_ID", "ANTHROPIC_API_KEY")
+_REQUIRED = frozenset(REQUIRED_KEYS)
+
+# Command-line option -> environment variable / config.json key
+OPTION_TO_ENV = {
+    "--google-api-key": "GOOGLE_API_KEY",
+    "--google-cse-id": "GOOGLE_CSE_ID",
+    "--anthropic-api-key": "ANTHROPIC_API_KEY",
+}
+
+def _dumps(obj):
+    """Serialize to JSON bytes, preferring orjson when it is installed."""
+    try:
+        import orjson
+    except ImportError:
+        import json
+        # No indent: json's C encoder does not support it and would fall back to Python
+        return json.dumps(obj).encode('utf-8')
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+def _loads(raw):
+    """Parse JSON bytes, preferring orjson when it is installed."""
+    try:
+        import orjson
+    except ImportError:
+        import json
+        return json.loads(raw)
+    return orjson.loads(raw)
+
+def _is_plain(value):
+    """Return True if a value can be written as a JSON string without escaping."""
+    return (isinstance(value, str) and value.isascii() and value.isprintable()
+            and '"' not in value and '\\' not in value)
+
+def _dump_config(api_keys):
+    """Serialize the API keys, writing the usual key-only shape directly."""
+    if api_keys and _REQUIRED.issuperset(api_keys) and all(map(_is_plain, api_keys.values())):
+        body = ",\n".join(f'  "{key}": "{value}"' for key, value in api_keys.items())
+        return ("{\n" + body + "\n}").encode('ascii')
+    return _dumps(api_keys)
 
 def create_config_file(api_keys):
     """Create a config.json file with API keys."""
-    with open('config.json', 'w') as f:
-        json.dump(api_keys, f, indent=2)
-    print("Created config.json with your API keys")
+    data = _dump_config(api_keys)
+    # Write to a temporary file and rename it so readers never see a partial file
+    tmp_path = 'config.json.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, 'config.json')
+
+def _read_raw(path):
+    """Read the raw contents of a config file."""
+    with open(path, 'rb') as f:
+        return f.read()
+
+@lru_cache(maxsize=8)
+def _parse(path, mtime_ns, size):
+    """Parse a config file once per file version (keyed on its mtime and size)."""
+    return _loads(_read_raw(path))
+
+def _cached_config(path='config.json'):
+    """Return the cached parse of a config file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+        return _parse(path, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
 
 def load_config():
     """Load API keys from config.json if it exists."""
-    if os.path.exists('config.json'):
-        with open('config.json', 'r') as f:
-            return json.load(f)
-    return {}
+    config = _cached_config()
+    if config is None:
+        return {}
+    # Copy so callers can update the keys without touching the cache
+    return dict(config)
+
+load_config.cache_clear = _parse.cache_clear
+
+def get_key(name):
+    """Return a single API key from config.json, or None if it is not set."""
+    config = _cached_config()
+    if config is None:
+        return None
+    return config.get(name)
 
 def set_environment_variables(api_keys):
     """Set environment variables from the API keys."""
-    for key, value in api_keys.items():
-        os.environ[key] = value
-    print("Environment variables set successfully")
+    changed = {key: value for key, value in api_keys.items()
+               if os.environ.get(key) != value}
+    if os.supports_bytes_environ:
+        # Hand over pre-encoded bytes so os.environ does not re-encode per key
+        os.environb.update({os.fsencode(key): os.fsencode(value)
+                            for key, value in changed.items()})
+    else:
+        os.environ.update(changed)
+
+HELP = """usage: config-helper.py [-h] [--google-api-key KEY] [--google-cse-id ID]
+                        [--anthropic-api-key KEY] [--save]
+
+Configure API keys for Web Research Tool
+
+options:
+  -h, --help            show this help message and exit
+  --google-api-key KEY  Google API Key for Custom Search
+  --google-cse-id ID    Google Custom Search Engine ID
+  --anthropic-api-key KEY
+                        Anthropic API Key for Claude
+  --save                Save configuration to config.json
+"""
 
 def main():
-    parser = argparse.ArgumentParser(description="Configure API keys for Web Research Tool")
-    parser.add_argument("--google-api-key", help="Google API Key for Custom Search")
-    parser.add_argument("--google-cse-id", help="Google Custom Search Engine ID")
-    parser.add_argument("--anthropic-api-key", help="Anthropic API Key for Claude")
-    parser.add_argument("--save", action="store_true", help="Save configuration to config.json")
+    new_keys = {}
+    save = False
     
-    args = parser.parse_args()
+    args = iter(sys.argv[1:])
+    for arg in args:
+        option, has_value, value = arg.partition("=")
+        if option in OPTION_TO_ENV:
+            if not has_value:
+                value = next(args, None)
+                # Like argparse, do not take another option as the value
+                if value is None or value.startswith("-"):
+                    sys.stderr.write(f"error: argument {option}: expected one argument\n")
+                    return 2
+            new_keys[OPTION_TO_ENV[option]] = value
+        elif arg == "--save":
+            save = True
+        elif arg in ("-h", "--help"):
+            sys.stdout.write(HELP)
+            return 0
+        else:
+            sys.stderr.write(f"error: unrecognized arguments: {arg}\n")
+            return 2
     
     # Load existing config if available
     api_keys = load_config()
+    original_keys = dict(api_keys)
     
     # Update with new values if provided
-    if args.google_api_key:
-        api_keys["GOOGLE_API_KEY"] = args.google_api_key
+    for key, value in new_keys.items():
+        if value:
+            api_keys[key] = value
     
-    if args.google_cse_id:
-        api_keys["GOOGLE_CSE_ID"] = args.google_cse_id
-    
-    if args.anthropic_api_key:
-        api_keys["ANTHROPIC_API_KEY"] = args.anthropic_api_key
+    # Collect status messages and emit them with a single write
+    messages = []
     
     # Save to file if requested
-    if args.save:
-        create_config_file(api_keys)
+    if save:
+        if api_keys == original_keys and os.path.exists('config.json'):
+            # Nothing changed; leave the file (and its mtime) untouched
+            messages.append("config.json is already up to date")
+        else:
+            create_config_file(api_keys)
+            messages.append("Created config.json with your API keys")
     
     # Set environment variables
     set_environment_variables(api_keys)
+    messages.append("Environment variables set successfully")
     
     # Check if all required keys are present
-    required_keys = ["GOOGLE_API_KEY", "GOOGLE_CSE_ID", "ANTHROPIC_API_KEY"]
-    missing_keys = [key for key in required_keys if key not in api_keys or not api_keys[key]]
+    missing = _REQUIRED.difference(key for key, value in api_keys.items() if value)
+    missing_keys = [key for key in REQUIRED_KEYS if key in missing]
     
     if missing_keys:
-        print(f"Warning: The following required API keys are missing: {', '.join(missing_keys)}")
-        print("Please set them using --google-api-key, --google-cse-id, and --anthropic-api-key arguments")
+        messages.append(f"Warning: The following required API keys are missing: {', '.join(missing_keys)}")
+        messages.append("Please set them using --google-api-key, --google-cse-id, and --anthropic-api-key arguments")
+        exit_code = 1
     else:
-        print("All required API keys are set")
+        messages.append("All required API keys are set")
+        exit_code = 0
+    
+    sys.stdout.write("\n".join(messages) + "\n")
+    return exit_code
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""
+Pytest configuration; its location puts the repository root on sys.path so the
+tests can import the web_research_tool package.
+"""
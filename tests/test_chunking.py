@@ -0,0 +1,51 @@
+"""
+Tests for splitting long documents into chunks.
+"""
+
+from web_research_tool.chunking import estimate_tokens, split_into_chunks, split_into_token_chunks
+
+def test_short_text_is_one_chunk():
+    assert split_into_chunks("A short text.", 100) == ["A short text."]
+
+def test_chunks_cover_text_without_overlap():
+    text = "".join(f"Sentence number {i} is here. " for i in range(200))
+    
+    chunks = split_into_chunks(text, 500)
+    
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 500 for chunk in chunks)
+
+def test_chunks_end_at_sentence_boundaries():
+    text = "".join(f"Sentence number {i} is here. " for i in range(200))
+    
+    chunks = split_into_chunks(text, 500)
+    
+    assert all(chunk.endswith(".") for chunk in chunks[:-1])
+    assert all(len(chunk) > 250 for chunk in chunks[:-1])
+
+def test_text_without_boundaries_is_cut_at_max_chars():
+    chunks = split_into_chunks("x" * 1050, 500)
+    
+    assert [len(chunk) for chunk in chunks] == [500, 500, 50]
+
+def test_estimate_tokens_counts_non_ascii_bytes():
+    assert estimate_tokens("abcd" * 100) == 100
+    # Each CJK character is three UTF-8 bytes, so it counts as 1/4 + 2/2 tokens
+    assert estimate_tokens("電" * 100) == 25 + 100
+
+def test_token_chunks_of_english_text_use_about_four_characters_per_token():
+    text = "".join(f"Sentence number {i} is here. " for i in range(400))
+    
+    chunks = split_into_token_chunks(text, 250)
+    
+    assert "".join(chunks) == text
+    assert all(estimate_tokens(chunk) <= 250 for chunk in chunks)
+    assert all(len(chunk) > 500 for chunk in chunks[:-1])
+
+def test_token_chunks_of_non_ascii_text_hold_fewer_characters():
+    text = "電池の研究。" * 500
+    
+    chunks = split_into_token_chunks(text, 250)
+    
+    assert "".join(chunks) == text
+    assert all(len(chunk) <= 250 for chunk in chunks)
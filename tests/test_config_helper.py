@@ -0,0 +1,35 @@
+"""
+Tests for the config-helper.py command-line script.
+"""
+
+import os
+import subprocess
+import sys
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config-helper.py")
+
+def _run(tmp_path, *args):
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("GOOGLE_API_KEY", "GOOGLE_CSE_ID", "ANTHROPIC_API_KEY")}
+    return subprocess.run([sys.executable, SCRIPT, *args], cwd=tmp_path, env=env,
+                          capture_output=True, text=True)
+
+def test_option_followed_by_another_option_is_rejected(tmp_path):
+    result = _run(tmp_path, "--google-api-key", "--save")
+    
+    assert result.returncode == 2
+    assert "expected one argument" in result.stderr
+    assert not (tmp_path / "config.json").exists()
+
+def test_option_without_value_is_rejected(tmp_path):
+    result = _run(tmp_path, "--google-cse-id")
+    
+    assert result.returncode == 2
+    assert "expected one argument" in result.stderr
+
+def test_values_are_saved(tmp_path):
+    result = _run(tmp_path, "--google-api-key", "g-key", "--google-cse-id=cse",
+                  "--anthropic-api-key", "a-key", "--save")
+    
+    assert result.returncode == 0
+    assert "g-key" in (tmp_path / "config.json").read_text()
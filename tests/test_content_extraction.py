@@ -0,0 +1,21 @@
+"""
+Tests for content extraction.
+"""
+
+import time
+
+from web_research_tool import content_extraction
+
+def test_extract_contents_returns_results_in_url_order(monkeypatch):
+    def extract(url, cache=None):
+        # Later URLs finish first
+        time.sleep(0.01 * (3 - int(url[-1])))
+        return f"Text of {url}", "html"
+    monkeypatch.setattr(content_extraction, "extract_content", extract)
+    
+    urls = [f"https://example.com/{i}" for i in range(3)]
+    
+    assert content_extraction.extract_contents(urls) == [(f"Text of {url}", "html") for url in urls]
+
+def test_extract_contents_of_no_urls():
+    assert content_extraction.extract_contents([]) == []
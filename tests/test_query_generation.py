@@ -0,0 +1,53 @@
+"""
+Tests for search query generation.
+"""
+
+import yaml
+
+from web_research_tool import query_generation
+from web_research_tool.models import Source
+
+QUERIES_YAML = '- query: "battery recycling"\n  importance: 5\n- query: "lithium policy"\n  importance: 3'
+
+def test_extract_yaml_from_yaml_fence():
+    result = f"Here are the queries:\n```yaml\n{QUERIES_YAML}\n```\nLet me know if you need more."
+    
+    assert query_generation._extract_yaml(result) == QUERIES_YAML
+
+def test_extract_yaml_from_unlabeled_fence():
+    assert query_generation._extract_yaml(f"```\n{QUERIES_YAML}\n```") == QUERIES_YAML
+
+def test_extract_yaml_takes_first_fenced_block():
+    result = f"```yaml\n{QUERIES_YAML}\n```\nExample output:\n```\nnot yaml: [\n```"
+    
+    assert query_generation._extract_yaml(result) == QUERIES_YAML
+
+def test_extract_yaml_without_fence():
+    assert query_generation._extract_yaml(f"\n{QUERIES_YAML}\n\n") == QUERIES_YAML
+
+def test_extract_yaml_from_unclosed_fence():
+    # A reply cut off at max_tokens has no closing fence
+    result = f"```yaml\n{QUERIES_YAML}\n"
+    
+    queries = yaml.safe_load(query_generation._extract_yaml(result))
+    
+    assert [query["query"] for query in queries] == ["battery recycling", "lithium policy"]
+
+def _source_with_topics(*topics):
+    return Source(url="https://example.com", title="Page", snippet="", content="",
+                  research_topics="\n".join(f"• {topic}" for topic in topics))
+
+def test_extract_topics_drops_duplicates_and_contained_topics():
+    sources = [
+        _source_with_topics("Battery recycling policy in the EU", "Solid-state electrolytes"),
+        _source_with_topics("battery  recycling policy", "Solid-state electrolytes", "Cobalt supply"),
+    ]
+    
+    assert query_generation.extract_topics_from_sources(sources) == [
+        "Battery recycling policy in the EU", "Solid-state electrolytes", "Cobalt supply"
+    ]
+
+def test_extract_topics_keeps_short_topic_that_is_only_part_of_a_word():
+    sources = [_source_with_topics("Email marketing regulation", "AI")]
+    
+    assert query_generation.extract_topics_from_sources(sources) == ["Email marketing regulation", "AI"]
@@ -0,0 +1,22 @@
+"""
+Tests for the client-side rate limiter.
+"""
+
+import pytest
+
+from web_research_tool.rate_limit import TokenBucket
+
+@pytest.mark.parametrize("rate", [0, -1.0])
+def test_token_bucket_rejects_non_positive_rate(rate):
+    with pytest.raises(ValueError):
+        TokenBucket(rate)
+
+def test_token_bucket_rejects_empty_burst():
+    with pytest.raises(ValueError):
+        TokenBucket(1.0, burst=0)
+
+def test_token_bucket_allows_burst_without_waiting():
+    bucket = TokenBucket(0.001, burst=3)
+    for _ in range(3):
+        bucket.take()
+    assert bucket._tokens < 1
@@ -0,0 +1,86 @@
+"""
+Tests for source relevance evaluation.
+"""
+
+from types import SimpleNamespace
+
+from web_research_tool import source_evaluation
+from web_research_tool.models import Source
+
+def _source(content, title="Page", snippet=""):
+    return Source(url="https://example.com", title=title, snippet=snippet, content=content)
+
+def test_task_keywords_reduce_plurals_to_singular():
+    keywords = source_evaluation._task_keywords({"topic": "Recycling policies for batteries and classes"})
+    
+    assert {"policy", "battery", "class", "recycling"} <= keywords
+
+def test_prefilter_passes_singular_mention_of_plural_task_word():
+    keywords = source_evaluation._task_keywords({"topic": "Battery recycling policies"})
+    source = _source("The new policy covers every lithium-ion cell sold in the region. " * 10)
+    
+    assert source_evaluation._prefilter_source(source, keywords) is None
+
+def test_prefilter_rejects_source_without_keywords():
+    keywords = source_evaluation._task_keywords({"topic": "Battery recycling policies"})
+    source = _source("Recipes for sourdough bread and other baked goods from our kitchen. " * 10)
+    
+    score, summary, _ = source_evaluation._prefilter_source(source, keywords)
+    
+    assert score == 0.0
+    assert "keywords" in summary
+
+def test_prefilter_rejects_source_with_too_little_text():
+    keywords = source_evaluation._task_keywords({"topic": "Battery recycling policies"})
+    
+    score, _, _ = source_evaluation._prefilter_source(_source("Battery policy"), keywords)
+    
+    assert score == 0.0
+
+class FakeClient:
+    """Anthropic client stand-in that replies with a record_evaluations tool call."""
+    
+    def __init__(self, evaluations):
+        self.messages = self
+        self.calls = []
+        self._evaluations = evaluations
+    
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return SimpleNamespace(
+            content=[
+                SimpleNamespace(type="text", text="Here are the evaluations."),
+                SimpleNamespace(type="tool_use", input={"evaluations": self._evaluations})
+            ],
+            usage=None
+        )
+
+def test_request_evaluations_reads_tool_call_in_item_order():
+    client = FakeClient([
+        {"number": 2, "score": 0.4, "summary": "• Second", "topics": "• Topic B"},
+        {"number": 1, "score": 0.9, "summary": "• First", "topics": "• Topic A"},
+    ])
+    
+    results = source_evaluation._request_evaluations(client, "prompt", 2, {"topic": "batteries"})
+    
+    assert results == [(0.9, "• First", "• Topic A"), (0.4, "• Second", "• Topic B")]
+    assert client.calls[0]["tool_choice"] == {"type": "tool", "name": "record_evaluations"}
+
+def test_request_evaluations_clamps_scores_and_fills_empty_text():
+    client = FakeClient([{"number": 1, "score": 1.7, "summary": " ", "topics": ""}])
+    
+    results = source_evaluation._request_evaluations(client, "prompt", 1, {"topic": "batteries"})
+    
+    assert results == [(1.0, "No summary available.", "No research topics suggested.")]
+
+def test_request_evaluations_skips_invalid_and_out_of_range_entries():
+    client = FakeClient([
+        {"number": 1, "score": "high", "summary": "", "topics": ""},
+        {"number": 3, "score": 0.5, "summary": "", "topics": ""},
+        {"score": 0.5, "summary": "", "topics": ""},
+        {"number": "2", "score": "0.7", "summary": "• Ok", "topics": "• T"},
+    ])
+    
+    results = source_evaluation._request_evaluations(client, "prompt", 2, {"topic": "batteries"})
+    
+    assert results == [None, (0.7, "• Ok", "• T")]
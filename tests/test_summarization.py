@@ -0,0 +1,44 @@
+"""
+Tests for detailed source summaries.
+"""
+
+from types import SimpleNamespace
+
+from web_research_tool import summarization
+from web_research_tool.models import Source
+
+class FakeClient:
+    """Anthropic client stand-in that returns the given stop reasons in turn."""
+    
+    def __init__(self, *stop_reasons):
+        self.messages = self
+        self.calls = []
+        self._stop_reasons = list(stop_reasons)
+    
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=f"Summary {len(self.calls)}")],
+            stop_reason=self._stop_reasons.pop(0),
+            usage=None
+        )
+
+def _short_source():
+    return Source(url="https://example.com", title="Short page", snippet="",
+                  content="A short document about batteries. " * 20)
+
+def test_short_document_gets_minimum_budget():
+    client = FakeClient("end_turn")
+    
+    summary = summarization._generate_source_summary(client, _short_source(), {"topic": "batteries"})
+    
+    assert summary == "Summary 1"
+    assert [call["max_tokens"] for call in client.calls] == [summarization.MIN_SUMMARY_TOKENS]
+
+def test_truncated_summary_is_retried_with_full_budget():
+    client = FakeClient("max_tokens", "end_turn")
+    
+    summary = summarization._generate_source_summary(client, _short_source(), {"topic": "batteries"})
+    
+    assert summary == "Summary 2"
+    assert [call["max_tokens"] for call in client.calls] == [summarization.MIN_SUMMARY_TOKENS, 4000]
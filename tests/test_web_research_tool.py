@@ -0,0 +1,65 @@
+"""
+Tests for the search loop of WebResearchTool.
+"""
+
+from web_research_tool import web_research_tool as wrt
+from web_research_tool.models import SearchQuery
+
+def _make_tool(**kwargs):
+    return wrt.WebResearchTool("google-key", "cse-id-12345", "anthropic-key-12345",
+                               delay=0, cache_path=None, generate_detailed_summaries=False,
+                               **kwargs)
+
+def test_rejected_result_does_not_use_up_the_last_slot(monkeypatch, tmp_path):
+    # One free slot, one search: the first result is rejected, so the second must
+    # be fetched and evaluated in the same iteration
+    results = [{'link': f"https://example.com/{i}", 'title': f"Page {i}", 'snippet': ""}
+               for i in range(3)]
+    scores = {"https://example.com/0": 0.2, "https://example.com/1": 0.9}
+    
+    monkeypatch.setattr(wrt, "generate_initial_queries",
+                        lambda client, task, cache=None: [SearchQuery("query", 5)])
+    monkeypatch.setattr(wrt, "google_search", lambda *args, **kwargs: results)
+    monkeypatch.setattr(wrt, "extract_contents",
+                        lambda urls, cache=None: [(f"Text of {url}", "html") for url in urls])
+    monkeypatch.setattr(wrt, "evaluate_sources_relevance",
+                        lambda client, sources, task, verbose, cache=None:
+                            [(scores.get(source.url, 0.0), "Summary", "") for source in sources])
+    
+    tool = _make_tool(max_sources=1, max_searches=1)
+    tool.conduct_research("topic: test\nobjective: test\n", str(tmp_path / "out"))
+    
+    assert [source.url for source in tool.sources] == ["https://example.com/1"]
+    # Fetching stops at the headroom instead of taking every result
+    assert len(tool._seen_urls) == wrt.FETCH_HEADROOM
+
+def test_normalize_url_drops_tracking_parameters_and_fragment():
+    assert (wrt._normalize_url("HTTPS://Example.COM/Page?id=3&utm_source=news&gclid=x#section")
+            == "https://example.com/Page?id=3")
+
+def test_normalize_url_keeps_path_case_and_other_parameters():
+    assert wrt._normalize_url("https://example.com/A/b?Q=1&page=2") == "https://example.com/A/b?Q=1&page=2"
+
+def test_same_page_is_fetched_once_across_queries(monkeypatch, tmp_path):
+    def search(service, cse_id, query, site_restrict, **kwargs):
+        return [{'link': f"https://example.com/shared?utm_source={query}", 'title': "Shared", 'snippet': ""},
+                {'link': f"https://example.com/{query}", 'title': query, 'snippet': ""}]
+    fetched = []
+    def extract(urls, cache=None):
+        fetched.extend(urls)
+        return [(f"Text of {url}", "html") for url in urls]
+    
+    monkeypatch.setattr(wrt, "generate_initial_queries",
+                        lambda client, task, cache=None: [SearchQuery("first", 5), SearchQuery("second", 4)])
+    monkeypatch.setattr(wrt, "generate_follow_up_queries", lambda *args, **kwargs: [])
+    monkeypatch.setattr(wrt, "google_search", search)
+    monkeypatch.setattr(wrt, "extract_contents", extract)
+    monkeypatch.setattr(wrt, "evaluate_sources_relevance",
+                        lambda client, sources, task, verbose, cache=None:
+                            [(0.9, "Summary", "") for source in sources])
+    
+    tool = _make_tool(max_sources=10, max_searches=2)
+    tool.conduct_research("topic: test\nobjective: test\n", str(tmp_path / "out"))
+    
+    assert fetched == ["https://example.com/shared?utm_source=first", "https://example.com/first",
+                       "https://example.com/second"]
@@ -0,0 +1,97 @@
+"""
+Persistent cache for API responses.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Optional
+
+DEFAULT_CACHE_PATH = ".web_research_cache.db"
+
+def make_key(*parts: Any) -> str:
+    """
+    Build a cache key from JSON-serializable parts.
+    
+    Args:
+        parts: Values that together identify a response
+        
+    Returns:
+        Hex digest identifying the parts
+    """
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+class ResponseCache:
+    """
+    SQLite-backed cache for API responses that persists across research runs.
+    
+    Values are stored as JSON under a namespace (e.g. "relevance") and a key.
+    The connection is shared between threads, so access is serialized with a lock.
+    """
+    
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, created REAL NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+    
+    def get(self, namespace: str, key: str, ttl: Optional[float] = None) -> Optional[Any]:
+        """
+        Look up a cached value.
+        
+        Args:
+            namespace: Cache namespace
+            key: Cache key (see make_key)
+            ttl: Maximum age of the entry in seconds, or None for no limit
+            
+        Returns:
+            The cached value, or None if there is no fresh entry
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created, value FROM responses WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+        
+        if row is None:
+            return None
+        created, value = row
+        if ttl is not None and time.time() - created > ttl:
+            return None
+        return json.loads(value)
+    
+    def set(self, namespace: str, key: str, value: Any):
+        """
+        Store a value in the cache.
+        
+        Args:
+            namespace: Cache namespace
+            key: Cache key (see make_key)
+            value: JSON-serializable value
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (namespace, key, created, value) VALUES (?, ?, ?, ?)",
+                (namespace, key, time.time(), json.dumps(value))
+            )
+            self._conn.commit()
+    
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,73 @@
+"""
+Functions for splitting long documents into chunks.
+"""
+
+from typing import List
+
+# Strings after which a chunk may end; the chunk ends after their first character
+_BOUNDARIES = ('\n', '. ', '! ', '? ')
+
+def split_into_chunks(text: str, max_chars: int) -> List[str]:
+    """
+    Split text into consecutive chunks of at most max_chars characters.
+    
+    Chunks end at a line break or sentence end where possible, so no overlap
+    between chunks is needed to keep sentences intact. Only the second half of
+    each window is searched for a boundary, so chunks are never shorter than
+    half of max_chars; if there is no boundary there, the text is cut at
+    max_chars.
+    
+    Args:
+        text: Text to split
+        max_chars: Maximum length of each chunk
+        
+    Returns:
+        List of chunks covering the whole text
+    """
+    chunks = []
+    start = 0
+    while len(text) - start > max_chars:
+        end = start + max_chars
+        cut = max(text.rfind(boundary, start + max_chars // 2, end) for boundary in _BOUNDARIES)
+        if cut != -1:
+            end = cut + 1
+        chunks.append(text[start:end])
+        start = end
+    chunks.append(text[start:])
+    return chunks
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of Claude tokens in a text without calling the API.
+    
+    English text averages about four characters per token, while non-ASCII
+    characters (e.g. CJK) often take a token each, so each extra UTF-8 byte
+    counts for half a token on top of the per-character estimate.
+    
+    Args:
+        text: Text to estimate
+    
+    Returns:
+        Estimated token count
+    """
+    if text.isascii():
+        return len(text) // 4
+    extra_bytes = len(text.encode('utf-8')) - len(text)
+    return len(text) // 4 + extra_bytes // 2
+
+def split_into_token_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into consecutive chunks of roughly max_tokens tokens each.
+    
+    The token budget is converted to a character count using the text's
+    estimated characters per token.
+    
+    Args:
+        text: Text to split
+        max_tokens: Maximum estimated tokens per chunk
+    
+    Returns:
+        List of chunks covering the whole text
+    """
+    chars_per_token = len(text) / max(1, estimate_tokens(text))
+    return split_into_chunks(text, max(1, int(max_tokens * chars_per_token)))
@@ -0,0 +1,145 @@
+"""
+Helpers for building Claude API requests.
+"""
+
+import copy
+import json
+import threading
+from typing import Any, Dict, List
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+def to_json(obj: Any) -> str:
+    """
+    Serialize an object as indented JSON for inclusion in a prompt.
+    
+    Uses orjson when it is installed, which is much faster than the stdlib
+    encoder's pure-Python indent path.
+    
+    Args:
+        obj: JSON-serializable object
+        
+    Returns:
+        JSON text indented by two spaces
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+    return json.dumps(obj, indent=2)
+
+# Research task most recently serialized by _task_text, and its serialization
+_last_task = None
+_last_task_text = None
+_last_task_lock = threading.Lock()
+
+def _task_text(research_task: Dict) -> str:
+    """
+    Serialize the research task, reusing the previous serialization if the task is unchanged.
+    
+    Every Claude call in a research run sends the same task, so it is only
+    serialized again when its contents change.
+    
+    Args:
+        research_task: Dictionary containing research task details
+        
+    Returns:
+        Indented JSON text of the research task
+    """
+    global _last_task, _last_task_text
+    with _last_task_lock:
+        if research_task != _last_task:
+            # Keep a private copy so changes to the caller's dict are detected
+            _last_task = copy.deepcopy(research_task)
+            _last_task_text = to_json(research_task)
+        return _last_task_text
+
+# Shortest prompt prefix that Claude caches: 2048 tokens for Haiku models, 1024 for
+# Sonnet and Opus. Shorter prefixes marked with cache_control are processed uncached.
+MIN_CACHEABLE_TOKENS = 2048
+
+# Prompt cache tokens reported by Claude since the process started
+_cache_usage = {'read': 0, 'written': 0}
+_cache_usage_lock = threading.Lock()
+
+def cached_system(instructions: str, research_task: Dict) -> List[Dict]:
+    """
+    Build a system prompt whose stable prefix can be reused through prompt caching.
+    
+    The instructions for this kind of call come first and the research task,
+    which is identical for every call in a research run, follows. The cache
+    breakpoint is set on the last block, so the tool definitions, instructions
+    and research task form the cached prefix, and only the dynamic content goes
+    into the user message.
+    
+    The prefix is only cached once it reaches MIN_CACHEABLE_TOKENS. A short
+    research task with one-line instructions stays below that, in which case
+    the breakpoint is ignored and the request is billed normally; record_cache_usage
+    and cache_usage show whether caching actually takes effect.
+    
+    Args:
+        instructions: Stable system instructions for this kind of call
+        research_task: Dictionary containing research task details
+        
+    Returns:
+        List of system content blocks
+    """
+    return [
+        {
+            "type": "text",
+            "text": instructions
+        },
+        {
+            "type": "text",
+            "text": f"RESEARCH TASK:\n{_task_text(research_task)}",
+            "cache_control": {"type": "ephemeral"}
+        }
+    ]
+
+def record_cache_usage(usage: Any):
+    """
+    Add the prompt cache token counts of a Claude response to the running totals.
+    
+    Args:
+        usage: Usage object of a Claude response
+    """
+    with _cache_usage_lock:
+        _cache_usage['read'] += getattr(usage, 'cache_read_input_tokens', None) or 0
+        _cache_usage['written'] += getattr(usage, 'cache_creation_input_tokens', None) or 0
+
+def cache_usage() -> Dict[str, int]:
+    """
+    Get the prompt cache token counts recorded so far.
+    
+    Returns:
+        Dictionary with the number of input tokens 'read' from and 'written' to the prompt cache
+    """
+    with _cache_usage_lock:
+        return dict(_cache_usage)
+
+def stream_text(anthropic_client: Any, echo: bool = False, **kwargs) -> str:
+    """
+    Run a message request with streaming and return the generated text.
+    
+    Streaming lets long generations show progress as they are produced
+    instead of blocking silently until the full response is ready.
+    
+    Args:
+        anthropic_client: Anthropic API client
+        echo: Whether to print the text to stdout as it arrives
+        kwargs: Arguments for messages.stream (model, max_tokens, system, messages, ...)
+        
+    Returns:
+        The complete generated text
+    """
+    parts = []
+    with anthropic_client.messages.stream(**kwargs) as stream:
+        for text in stream.text_stream:
+            parts.append(text)
+            if echo:
+                print(text, end="", flush=True)
+        record_cache_usage(stream.get_final_message().usage)
+    if echo:
+        print()
+    return "".join(parts)
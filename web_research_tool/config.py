@@ -19,15 +19,17 @@ def load_config(config_file: Optional[str] = None) -> Dict[str, Any]:
     config = {}
     
     # Try to load config file if specified
-    if config_file and os.path.exists(config_file):
+    if config_file:
         try:
-            with open(config_file, 'r') as f:
-                file_config = json.load(f)
-                for key, value in file_config.items():
-                    # Update environment variables for compatibility
-                    os.environ[key] = value
-                    config[key] = value
+            with open(config_file, 'rb') as f:
+                file_config = json.loads(f.read())
+            for key, value in file_config.items():
+                # Update environment variables for compatibility
+                os.environ[key] = value
+                config[key] = value
             print(f"Loaded API keys from {config_file}")
+        except FileNotFoundError:
+            pass
         except Exception as e:
             print(f"Error loading config file: {e}")
     
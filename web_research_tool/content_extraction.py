@@ -3,15 +3,202 @@ Functions for extracting content from URLs.
 """
 
 import io
+import os
+import hashlib
+import itertools
+import re
+import threading
 import requests
-from typing import Tuple
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+from bs4 import BeautifulSoup, UnicodeDammit
 import PyPDF2
+from .cache import ResponseCache, make_key
 
-def extract_content(url: str) -> Tuple[str, str]:
+# Use the much faster lxml parser when it is installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Use selectolax's lexbor engine, a fast C HTML parser, when it is installed
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# Use PyMuPDF's native text extraction for PDFs when it is installed
+try:
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Content types we can extract text from
+SUPPORTED_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain', 'application/pdf')
+
+# Maximum size of a downloaded response in bytes
+MAX_DOWNLOAD_SIZE = 20 * 1024 * 1024
+
+# Extracted page content is reused for a day
+CONTENT_CACHE_TTL = 24 * 3600
+
+# Maximum amount of text kept from a document; remaining PDF pages are not parsed
+MAX_TEXT_LENGTH = 500000
+
+# Maximum number of PDF pages parsed, which bounds the work on scanned PDFs with little text
+MAX_PDF_PAGES = 100
+
+def _create_session() -> requests.Session:
+    """
+    Create the HTTP session shared by all fetches.
+    
+    Reusing one session keeps TCP/TLS connections alive between requests to
+    the same host instead of reconnecting for every URL.
+    """
+    session = requests.Session()
+    session.headers["User-Agent"] = (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    )
+    # Enough pooled connections per host for the concurrent fetch threads
+    adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+_session = _create_session()
+
+# Number of recently extracted documents whose text is kept, keyed by a hash of the response body
+BODY_TEXT_CACHE_SIZE = 128
+
+_body_text_cache = OrderedDict()
+_body_text_lock = threading.Lock()
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    """
+    Get the shared process pool used for PDF text extraction.
+    
+    PDF parsing is CPU-bound pure Python, so it runs in separate processes to
+    avoid serializing the concurrent fetch threads behind the GIL.
+    """
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, 4))
+        return _pdf_pool
+
+def _extract_pdf_text(data: bytes) -> str:
+    """
+    Extract the text of a PDF document.
+    
+    Args:
+        data: Raw PDF bytes
+        
+    Returns:
+        Extracted text, one page per line block
+    """
+    if pymupdf is not None:
+        with pymupdf.open(stream=data, filetype="pdf") as document:
+            return _join_pages(page.get_text() for page in document)
+    
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return _join_pages(page.extract_text() or "" for page in pdf_reader.pages)
+
+def _join_pages(page_texts: Iterable[str]) -> str:
+    """
+    Join the text of PDF pages, extracting pages only until the page or length limit is reached.
+    
+    Args:
+        page_texts: Lazily extracted text of each page
+        
+    Returns:
+        Joined text, one page per line block
+    """
+    pages = []
+    total_length = 0
+    for text in itertools.islice(page_texts, MAX_PDF_PAGES):
+        pages.append(text)
+        total_length += len(text) + 1
+        # Stop once we have more text than any later step will use
+        if total_length >= MAX_TEXT_LENGTH:
+            break
+    return "\n".join(pages) + "\n"
+
+def _extract_html_text(body: bytes, encoding: Optional[str] = None) -> str:
+    """
+    Extract the visible text of an HTML document.
+    
+    Args:
+        body: Raw HTML bytes
+        encoding: Encoding declared in the Content-Type header, if any
+        
+    Returns:
+        Text with script and style contents removed and whitespace collapsed,
+        truncated to MAX_TEXT_LENGTH characters
+    """
+    if LexborHTMLParser is not None:
+        # lexbor assumes UTF-8, so decode with the declared or detected encoding first
+        if encoding:
+            markup = body.decode(encoding, errors='replace')
+        else:
+            markup = UnicodeDammit(body, is_html=True).unicode_markup
+        tree = LexborHTMLParser(markup)
+        
+        # Remove script and style elements
+        for node in tree.css('script, style'):
+            node.decompose()
+        
+        text = tree.root.text(separator=' ', strip=True) if tree.root else ''
+    else:
+        soup = BeautifulSoup(body, HTML_PARSER, from_encoding=encoding)
+        
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+        
+        text = soup.get_text(separator=' ', strip=True)
+    
+    # Collapse all whitespace runs in a single pass
+    text = _WHITESPACE_RE.sub(' ', text).strip()
+    return text[:MAX_TEXT_LENGTH]
+
+def extract_content(url: str, cache: Optional[ResponseCache] = None) -> Tuple[str, str]:
     """
     Extract content from a URL (handles both HTML and PDF).
     
+    Args:
+        url: URL to fetch content from
+        cache: Optional response cache to reuse content extracted in earlier runs
+        
+    Returns:
+        Tuple of (content, content_type)
+    """
+    if cache is None:
+        return _extract_content(url)
+    
+    key = make_key("content-v1", url)
+    cached = cache.get("content", key, ttl=CONTENT_CACHE_TTL)
+    if cached is not None:
+        return tuple(cached)
+    
+    content, content_type = _extract_content(url)
+    # Failed fetches are retried on the next run
+    if content_type != 'error' and not content.startswith("[PDF EXTRACTION ERROR"):
+        cache.set("content", key, [content, content_type])
+    return content, content_type
+
+def _extract_content(url: str) -> Tuple[str, str]:
+    """
+    Download a URL and extract its text.
+    
     Args:
         url: URL to fetch content from
         
@@ -19,43 +206,79 @@ def extract_content(url: str) -> Tuple[str, str]:
         Tuple of (content, content_type)
     """
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        content_type = response.headers.get('Content-Type', '').lower()
+        with _session.get(url, timeout=10, stream=True) as response:
+            content_type = response.headers.get('Content-Type', '').lower()
+            
+            # Skip anything we cannot extract text from before downloading it
+            if content_type and not any(t in content_type for t in SUPPORTED_CONTENT_TYPES):
+                return f"[CONTENT EXTRACTION ERROR: unsupported content type {content_type}]", 'error'
+            
+            content_length = response.headers.get('Content-Length', '')
+            if content_length.isdigit() and int(content_length) > MAX_DOWNLOAD_SIZE:
+                return f"[CONTENT EXTRACTION ERROR: response too large ({content_length} bytes)]", 'error'
+            
+            # Download the body, aborting if it grows past the size limit
+            body_chunks = []
+            body_size = 0
+            for chunk in response.iter_content(chunk_size=65536):
+                body_chunks.append(chunk)
+                body_size += len(chunk)
+                if body_size > MAX_DOWNLOAD_SIZE:
+                    return f"[CONTENT EXTRACTION ERROR: response larger than {MAX_DOWNLOAD_SIZE} bytes]", 'error'
+            body = b''.join(body_chunks)
+            # Only trust the declared encoding; otherwise let BeautifulSoup detect it
+            encoding = response.encoding if 'charset=' in content_type else None
+        
+        is_pdf = 'application/pdf' in content_type
+        
+        # Identical bodies (mirrors, URLs differing only in tracking parameters) are parsed once
+        body_key = (hashlib.blake2b(body, digest_size=16).digest(), is_pdf, encoding)
+        with _body_text_lock:
+            cached = _body_text_cache.get(body_key)
+            if cached is not None:
+                _body_text_cache.move_to_end(body_key)
+                return cached
         
-        if 'application/pdf' in content_type:
+        if is_pdf:
             # Handle PDF
             try:
-                pdf_file = io.BytesIO(response.content)
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                content = ""
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    content += page.extract_text() + "\n"
-                return content, 'pdf'
+                result = _get_pdf_pool().submit(_extract_pdf_text, body).result(), 'pdf'
             except Exception as e:
                 print(f"Error extracting PDF content: {e}")
                 return f"[PDF EXTRACTION ERROR: {e}]", 'pdf'
         else:
             # Handle HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.extract()
-            
-            # Get text
-            text = soup.get_text(separator=' ', strip=True)
-            
-            # Remove extra whitespace
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
-            
-            return text, 'html'
+            result = _extract_html_text(body, encoding), 'html'
+        
+        with _body_text_lock:
+            _body_text_cache[body_key] = result
+            if len(_body_text_cache) > BODY_TEXT_CACHE_SIZE:
+                _body_text_cache.popitem(last=False)
+        return result
             
     except Exception as e:
         print(f"Error fetching URL {url}: {e}")
         return f"[CONTENT EXTRACTION ERROR: {e}]", 'error'
+
+
+def extract_contents(urls: List[str], max_workers: int = 5,
+                     cache: Optional[ResponseCache] = None) -> List[Tuple[str, str]]:
+    """
+    Extract content from several URLs concurrently.
+    
+    Fetching is I/O-bound, so the URLs are downloaded in parallel threads
+    instead of one after another.
+    
+    Args:
+        urls: URLs to fetch content from
+        max_workers: Maximum number of concurrent fetches
+        cache: Optional response cache to reuse content extracted in earlier runs
+        
+    Returns:
+        List of (content, content_type) tuples in the same order as urls
+    """
+    if not urls:
+        return []
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as executor:
+        return list(executor.map(lambda url: extract_content(url, cache), urls))
@@ -8,9 +8,14 @@ import platform
 from typing import List, Tuple
 import yaml
 
+from .cache import DEFAULT_CACHE_PATH
 from .config import load_config, validate_config
 from .web_research_tool import WebResearchTool
 
+# Use the LibYAML-based C loader and dumper when PyYAML was built with them
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
 def main():
     """Main entry point for the command-line interface."""
     parser = argparse.ArgumentParser(description="Web Research Tool with Claude")
@@ -22,8 +27,14 @@ def main():
     parser.add_argument("--delay", "-d", type=float, default=1.0, help="Delay between API requests (in seconds)")
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose output")
     parser.add_argument("--detailed-summaries", "-D", action="store_true", help="Do detailed summaries")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the on-disk response cache")
+    parser.add_argument("--claude-rpm", type=float, default=50, help="Maximum Claude API requests per minute")
+    parser.add_argument("--search-concurrency", type=int, default=1, help="Number of queries searched concurrently per iteration")
+    parser.add_argument("--synthesis-model", type=str, help="Claude model for the final research summary (default: Claude 3.5 Haiku, like all other requests)")
     
     args = parser.parse_args()
+    if args.claude_rpm <= 0:
+        parser.error("--claude-rpm must be greater than 0")
     
     # Load configuration
     config = load_config(args.config)
@@ -64,7 +75,7 @@ def main():
     
     # Handle YAML content
     try:
-        request_data = yaml.safe_load(yaml_request)
+        request_data = yaml.load(yaml_request, Loader=_YAML_LOADER)
         
         # Check if detailed_summaries is specified in the YAML
         generate_detailed_summaries = args.detailed_summaries
@@ -72,7 +83,7 @@ def main():
             generate_detailed_summaries = request_data["detailed_summaries"]
             # Remove from request to avoid confusion in processing
             del request_data["detailed_summaries"]
-            yaml_request = yaml.dump(request_data)
+            yaml_request = yaml.dump(request_data, Dumper=_YAML_DUMPER)
             
     except yaml.YAMLError as e:
         print(f"Error parsing YAML: {e}")
@@ -87,7 +98,11 @@ def main():
         max_searches=args.max_searches,
         delay=args.delay,
         verbose=args.verbose,
-        generate_detailed_summaries=generate_detailed_summaries
+        generate_detailed_summaries=generate_detailed_summaries,
+        cache_path=None if args.no_cache else DEFAULT_CACHE_PATH,
+        anthropic_requests_per_minute=args.claude_rpm,
+        search_concurrency=args.search_concurrency,
+        synthesis_model=args.synthesis_model
     )
     
     # Conduct the research
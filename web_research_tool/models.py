@@ -2,10 +2,26 @@
 Data models for the Web Research Tool.
 """
 
-from typing import Optional
-from dataclasses import dataclass, asdict
+import sys
+from typing import Optional, Tuple
+from functools import lru_cache
+from dataclasses import dataclass, fields
 
-@dataclass
+# Give instances __slots__ instead of a __dict__ where dataclass supports it (Python 3.10+)
+_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@lru_cache(maxsize=1024)
+def _split_topics(research_topics: str) -> Tuple[str, ...]:
+    """
+    Split a bullet-point list of research topics into cleaned-up topics.
+    
+    Cached so each source's topics text is only parsed once, no matter how
+    many times it is used during follow-up query generation and summarization.
+    """
+    topics = research_topics.replace('•', '').split('\n')
+    return tuple(t.strip() for t in topics if t.strip())
+
+@dataclass(**_DATACLASS_OPTIONS)
 class SearchQuery:
     """
     Represents a search query with optional site restriction and importance ranking.
@@ -13,8 +29,15 @@ class SearchQuery:
     query: str                          # The actual search query text to execute
     importance: int = 1                 # Priority ranking from 1-5, with 5 being highest priority
     site_restrict: Optional[str] = None # Optional site restriction (e.g., "site:example.com")
+    
+    @property
+    def key(self) -> str:
+        """
+        Identify the search this query runs; queries with the same key are only executed once.
+        """
+        return f"{self.query}:{self.site_restrict}"
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class Source:
     """
     Represents a source with its metadata and content.
@@ -29,8 +52,20 @@ class Source:
     research_topics: str = "" # Suggested follow-up research topics based on this source
     detailed_summary: str = "" # Comprehensive summary of the source (optional, may be generated later)
     
+    def topic_list(self) -> Tuple[str, ...]:
+        """
+        Get the suggested research topics as a tuple of cleaned-up strings.
+        """
+        return _split_topics(self.research_topics)
+    
     def to_dict(self):
         """
         Convert source to dictionary.
+        
+        All fields are flat values, so a shallow dict is built directly instead
+        of going through dataclasses.asdict's recursive copy.
         """
-        return asdict(self)
\ No newline at end of file
+        return {name: getattr(self, name) for name in _SOURCE_FIELDS}
+
+# Field names of Source, in declaration order
+_SOURCE_FIELDS = tuple(f.name for f in fields(Source))
\ No newline at end of file
@@ -3,15 +3,26 @@ Functions for formatting and saving research output.
 """
 
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple
 from datetime import datetime
 from urllib.parse import urlparse
 from .models import Source
 
+# Number of characters of source content encoded and written at a time
+WRITE_CHUNK_SIZE = 64 * 1024
+
+# Characters replaced with "_" in the domain and path parts of source filenames
+_UNSAFE_DOMAIN_CHARS_RE = re.compile(r'[^A-Za-z0-9-]')
+_UNSAFE_PATH_CHARS_RE = re.compile(r'[^A-Za-z0-9._-]')
+
 def save_source_content(sources: List[Source], output_dir: str) -> List[str]:
     """
     Save the content of each source to a file and return file paths.
     
+    The files are independent, so they are written concurrently.
+    
     Args:
         sources: List of sources
         output_dir: Directory to save files in
@@ -20,46 +31,70 @@ def save_source_content(sources: List[Source], output_dir: str) -> List[str]:
         List of saved file paths
     """
     os.makedirs(output_dir, exist_ok=True)
-    file_paths = []
-    
-    for i, source in enumerate(sources):
-        # Create a safe filename from the URL
-        parsed_url = urlparse(source.url)
-        domain = parsed_url.netloc.replace(".", "_")
-        path = parsed_url.path.replace("/", "_")
-        if not path:
-            path = "_index"
-        
-        # Determine file extension based on content type
-        if source.content_type == 'pdf':
-            ext = '.pdf'
-        else:
-            ext = '.txt'
-        
-        # Create filename
-        filename = f"{i+1:02d}_{domain}{path[:50]}{ext}"
-        filepath = os.path.join(output_dir, filename)
-        
-        # Write content to file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(f"SOURCE: {source.title}\n")
-            f.write(f"URL: {source.url}\n")
-            f.write(f"RELEVANCE: {source.relevance_score}\n")
-            
-            # Add short summary if available
-            if source.short_summary:
-                f.write(f"\nKEY POINTS:\n{source.short_summary}\n")
-            
-            # Add research topics if available
-            if source.research_topics:
-                f.write(f"\nSUGGESTED RESEARCH TOPICS:\n{source.research_topics}\n")
-            
-            f.write("\n" + "="*80 + "\n\n")
-            f.write(source.content)
+    if not sources:
+        return []
+    
+    with ThreadPoolExecutor(max_workers=min(8, len(sources))) as executor:
+        return list(executor.map(
+            lambda item: _write_source_file(item[0], item[1], output_dir),
+            enumerate(sources)
+        ))
+
+def _write_source_file(index: int, source: Source, output_dir: str) -> str:
+    """
+    Write a single source to a file.
+    
+    Args:
+        index: Zero-based position of the source in the source list
+        source: Source to write
+        output_dir: Directory to save the file in
         
-        file_paths.append(filepath)
+    Returns:
+        Path of the saved file
+    """
+    # Create a safe filename from the URL
+    parsed_url = urlparse(source.url)
+    domain = _UNSAFE_DOMAIN_CHARS_RE.sub("_", parsed_url.netloc)
+    path = _UNSAFE_PATH_CHARS_RE.sub("_", parsed_url.path)
+    if not path:
+        path = "_index"
+    
+    # Determine file extension based on content type
+    if source.content_type == 'pdf':
+        ext = '.pdf'
+    else:
+        ext = '.txt'
+    
+    # Create filename
+    filename = f"{index+1:02d}_{domain}{path[:50]}{ext}"
+    filepath = os.path.join(output_dir, filename)
+    
+    # Assemble the header so it is written in one call
+    header = [
+        f"SOURCE: {source.title}\n",
+        f"URL: {source.url}\n",
+        f"RELEVANCE: {source.relevance_score}\n",
+    ]
+    
+    # Add short summary if available
+    if source.short_summary:
+        header.append(f"\nKEY POINTS:\n{source.short_summary}\n")
+    
+    # Add research topics if available
+    if source.research_topics:
+        header.append(f"\nSUGGESTED RESEARCH TOPICS:\n{source.research_topics}\n")
+    
+    header.append("\n" + "="*80 + "\n\n")
+    
+    # Write content to file
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write("".join(header))
+        # Write the content in slices so only one slice at a time is held in encoded form
+        content = source.content
+        for start in range(0, len(content), WRITE_CHUNK_SIZE):
+            f.write(content[start:start + WRITE_CHUNK_SIZE])
     
-    return file_paths
+    return filepath
 
 def prepare_for_claude(research_task: Dict, sources: List[Source], summary: str, output_dir: str) -> str:
     """
@@ -75,6 +110,7 @@ def prepare_for_claude(research_task: Dict, sources: List[Source], summary: str,
         Text output for Claude Web
     """
     output = []
+    has_detailed_summaries = any(s.detailed_summary for s in sources)
     
     # Add header
     output.append(f"# Research Results: {research_task.get('topic', 'Research Topic')}")
@@ -89,7 +125,7 @@ def prepare_for_claude(research_task: Dict, sources: List[Source], summary: str,
     output.append(f"Source content has been saved to: {output_dir}\n")
     
     # List all sources with their full URLs for extended summary reports (short ones already has this info in summary)
-    if any(s.detailed_summary for s in sources):
+    if has_detailed_summaries:
         output.append("Full source URLs for easy reference:")
         for i, source in enumerate(sources):
             output.append(f"{i+1}. [{source.title}]({source.url})")
@@ -107,7 +143,7 @@ def prepare_for_claude(research_task: Dict, sources: List[Source], summary: str,
     output.append("Copy this summary and upload the source files to continue your research conversation with Claude.")
     
     # Add option to get detailed summaries if they weren't generated
-    if not any(s.detailed_summary for s in sources):
+    if not has_detailed_summaries:
         output.append("\n## Generating Detailed Summaries")
         output.append("This research was conducted in quick mode. To generate detailed summaries, run again with:")
         output.append("```")
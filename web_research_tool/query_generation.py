@@ -2,27 +2,36 @@
 Functions for generating search queries.
 """
 
+import re
 import yaml
-import json
-from typing import Dict, List, Any
+from collections import defaultdict
+from dataclasses import asdict
+from typing import Dict, List, Any, Optional
+from .cache import ResponseCache, make_key
+from .claude import cached_system, record_cache_usage, to_json
 from .models import SearchQuery, Source
 
-def generate_initial_queries(anthropic_client: Any, research_task: Dict) -> List[SearchQuery]:
-    """
-    Use Claude to generate initial search queries based on the research task.
-    
-    Args:
-        anthropic_client: Anthropic API client
-        research_task: Dictionary containing research task details
-        
-    Returns:
-        List of SearchQuery objects
-    """
-    prompt = f"""
+# Cached query suggestions are reused for a week
+QUERY_CACHE_TTL = 7 * 24 * 3600
+
+# Maximum number of suggested research topics passed to follow-up query generation
+MAX_FOLLOW_UP_TOPICS = 20
+
+# Words of a research topic, ignoring case and punctuation when topics are compared
+_TOPIC_WORD_RE = re.compile(r'\w+')
+
+# Use the LibYAML-based C loader when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# First fenced block of a response; the closing fence is optional because replies cut
+# off at max_tokens end inside the block
+_YAML_FENCE_RE = re.compile(r'```(?:yaml)?\s*(.*?)(?:```|\Z)', re.DOTALL)
+
+# Prompt asking Claude for the initial search queries; the research task is in the system prompt
+_INITIAL_QUERIES_PROMPT = """
     You are a research assistant helping to generate effective search queries.
     
-    RESEARCH TASK:
-    {json.dumps(research_task, indent=2)}
+    The research task is described in the system prompt.
     
     Based on this research task, generate 2 specific search queries that would be most effective for finding relevant information.
     For each query, assign an importance score from 1-5 (5 being highest priority).
@@ -41,34 +50,118 @@ def generate_initial_queries(anthropic_client: Any, research_task: Dict) -> List
     
     ONLY INCLUDE THE YAML IN YOUR RESPONSE, NO OTHER TEXT.
     """
+
+# Prompt asking Claude for follow-up search queries, formatted with the JSON of the
+# previous queries and of the suggested research topics
+_FOLLOW_UP_QUERIES_PROMPT = """
+    You are a research assistant helping to generate effective follow-up search queries.
+    
+    The research task is described in the system prompt.
+    
+    PREVIOUS QUERIES:
+    {previous_queries}
+    
+
+    SUGGESTED RESEARCH TOPICS FROM SOURCES:
+    {suggested_topics}
+    
+    Based on the research task, sources found so far, and suggested research topics, generate 1 new search queries that would help find additional relevant information.
+    
+    Focus on:
+    1. Filling knowledge gaps in the current sources
+    2. Exploring the suggested research topics from highly relevant sources
+    3. Finding more specific or authoritative sources
+    4. Exploring aspects of the topic not yet covered
+    5. Do not repeat previous queries
+    
+    For each query, assign an importance score from 1-5 (5 being highest priority).
+    You may optionally specify site restrictions for any query (like site:example.com).
+    
+    FORMAT YOUR RESPONSE AS A YAML LIST:
+    
+    ```yaml
+    - query: "first search query"
+      importance: 5
+      site_restrict: "optional_site_restriction"
+    ```
+    
+    ONLY INCLUDE THE YAML IN YOUR RESPONSE, NO OTHER TEXT.
+    """
+
+def _extract_yaml(result: str) -> str:
+    """
+    Extract the YAML content from Claude's response, with or without a code fence.
+    
+    Args:
+        result: Response text
+        
+    Returns:
+        YAML content
+    """
+    match = _YAML_FENCE_RE.search(result)
+    if match:
+        return match.group(1).strip()
+    return result.strip()
+
+def _get_cached_queries(cache: Optional[ResponseCache], key: str) -> Optional[List[SearchQuery]]:
+    """Return cached query suggestions, or None if there are none."""
+    if cache is None:
+        return None
+    cached = cache.get("queries", key, ttl=QUERY_CACHE_TTL)
+    if cached is None:
+        return None
+    return [SearchQuery(**query) for query in cached]
+
+def _store_queries(cache: Optional[ResponseCache], key: str, queries: List[SearchQuery]):
+    """Store successfully parsed query suggestions in the cache."""
+    if cache is not None:
+        cache.set("queries", key, [asdict(query) for query in queries])
+
+def generate_initial_queries(anthropic_client: Any, research_task: Dict,
+                             cache: Optional[ResponseCache] = None) -> List[SearchQuery]:
+    """
+    Use Claude to generate initial search queries based on the research task.
+    
+    Args:
+        anthropic_client: Anthropic API client
+        research_task: Dictionary containing research task details
+        cache: Optional response cache to reuse query suggestions from earlier runs
+        
+    Returns:
+        List of SearchQuery objects
+    """
+    cache_key = make_key("initial-queries-v1", research_task)
+    cached = _get_cached_queries(cache, cache_key)
+    if cached is not None:
+        return cached
+    
+    prompt = _INITIAL_QUERIES_PROMPT
     
     response = anthropic_client.messages.create(
         model="claude-3-5-haiku-20241022",
-        max_tokens=1000,
-        temperature=0.2,
-        system="You are a helpful research assistant that generates effective search queries.",
+        max_tokens=300,
+        temperature=0.0,
+        system=cached_system("You are a helpful research assistant that generates effective search queries.", research_task),
         messages=[
             {"role": "user", "content": prompt}
         ]
     )
+    record_cache_usage(response.usage)
     
     result = response.content[0].text
     
-    # Extract YAML content
-    if "```yaml" in result:
-        yaml_content = result.split("```yaml")[1].split("```")[0].strip()
-    elif "```" in result:
-        yaml_content = result.split("```")[1].strip()
-    else:
-        yaml_content = result.strip()
+    yaml_content = _extract_yaml(result)
     
     try:
-        queries_data = yaml.safe_load(yaml_content)
-        return [SearchQuery(**query) for query in queries_data]
+        queries_data = yaml.load(yaml_content, Loader=_YAML_LOADER)
+        queries = [SearchQuery(**query) for query in queries_data]
     except Exception as e:
         print(f"Error parsing Claude's query suggestions: {e}")
         print(f"Raw response: {result}")
         return [SearchQuery(query=f"Research {research_task.get('topic', 'topic')}")]
+    
+    _store_queries(cache, cache_key, queries)
+    return queries
 
 
 def append_to_debug_file(content: str, file_path: str = "debug_output.txt"):
@@ -82,9 +175,36 @@ def append_to_debug_file(content: str, file_path: str = "debug_output.txt"):
     with open(file_path, 'a') as file:
         file.write(content + '\n')
 
+def _rank_topics(sources: List[Source], limit: int = MAX_FOLLOW_UP_TOPICS) -> List[str]:
+    """
+    Rank the suggested research topics of all sources and return the best ones.
+    
+    Each source contributes 1 / (rank * sqrt(1 - relevance)) to each of its
+    topics, where rank is the source's position by relevance, so topics from
+    highly relevant sources and topics suggested by several sources come first.
+    
+    Args:
+        sources: List of sources found so far
+        limit: Maximum number of topics to return
+        
+    Returns:
+        Topics ordered by descending score
+    """
+    scores = defaultdict(float)
+    ranked_sources = sorted(sources, key=lambda s: s.relevance_score, reverse=True)
+    for rank, source in enumerate(ranked_sources, 1):
+        if not source.research_topics:
+            continue
+        weight = 1.0 / (rank * max(1e-3, 1.0 - source.relevance_score) ** 0.5)
+        for topic in source.topic_list():
+            scores[topic] += weight
+    
+    return sorted(scores, key=scores.get, reverse=True)[:limit]
+
 def generate_follow_up_queries(anthropic_client: Any, research_task: Dict, 
                               sources: List[Source], 
-                              previous_queries: List[str]) -> List[SearchQuery]:
+                              previous_queries: List[str],
+                              cache: Optional[ResponseCache] = None) -> List[SearchQuery]:
     """
     Generate follow-up search queries based on sources found so far.
     Enhanced to utilize short summaries and research topics.
@@ -94,94 +214,37 @@ def generate_follow_up_queries(anthropic_client: Any, research_task: Dict,
         research_task: Dictionary containing research task details
         sources: List of sources found so far
         previous_queries: List of queries already executed
+        cache: Optional response cache to reuse query suggestions from earlier runs
         
     Returns:
         List of new SearchQuery objects
     """
-    # Create a more detailed summary of sources found so far
-    sources_summary = []
-    collected_research_topics = []
-    knowledge_gaps = []
-    
-    for s in sources:
-        source_info = {
-            "title": s.title,
-            "url": s.url,
-            "relevance": s.relevance_score
-        }
-        
-        # Include short summaries if available
-        if s.short_summary:
-            source_info["key_points"] = s.short_summary
-            
-        # Extract and collect research topics
-        if s.research_topics:
-            source_info["suggested_topics"] = s.research_topics
-            
-            # Clean up the research topics and add to our collection
-            topics = s.research_topics.replace('•', '').split('\n')
-            topics = [t.strip() for t in topics if t.strip()]
-            collected_research_topics.extend(topics)
-            
-        sources_summary.append(source_info)
-        
-    # Process collected research topics to identify potential knowledge gaps
-    # Only include topics that appear in highly relevant sources (relevance > 0.7)
-    high_relevance_topics = []
-    for s in sources:
-        if s.relevance_score > 0.7 and s.research_topics:
-            topics = s.research_topics.replace('•', '').split('\n')
-            topics = [t.strip() for t in topics if t.strip()]
-            high_relevance_topics.extend(topics)
-    
-    prompt = f"""
-    You are a research assistant helping to generate effective follow-up search queries.
-    
-    RESEARCH TASK:
-    {json.dumps(research_task, indent=2)}
+    high_relevance_topics = _rank_topics(sources)
     
-    PREVIOUS QUERIES:
-    {json.dumps(previous_queries, indent=2)}
+    # The prompt only depends on the task, the previous queries and the suggested topics
+    cache_key = make_key("follow-up-queries-v1", research_task, previous_queries, high_relevance_topics)
+    cached = _get_cached_queries(cache, cache_key)
+    if cached is not None:
+        return cached
     
-
-    SUGGESTED RESEARCH TOPICS FROM SOURCES:
-    {json.dumps(high_relevance_topics, indent=2)}
-    
-    Based on the research task, sources found so far, and suggested research topics, generate 1 new search queries that would help find additional relevant information.
-    
-    Focus on:
-    1. Filling knowledge gaps in the current sources
-    2. Exploring the suggested research topics from highly relevant sources
-    3. Finding more specific or authoritative sources
-    4. Exploring aspects of the topic not yet covered
-    5. Do not repeat previous queries
-    
-    For each query, assign an importance score from 1-5 (5 being highest priority).
-    You may optionally specify site restrictions for any query (like site:example.com).
-    
-    FORMAT YOUR RESPONSE AS A YAML LIST:
-    
-    ```yaml
-    - query: "first search query"
-      importance: 5
-      site_restrict: "optional_site_restriction"
-    ```
-    
-    ONLY INCLUDE THE YAML IN YOUR RESPONSE, NO OTHER TEXT.
-    """
+    prompt = _FOLLOW_UP_QUERIES_PROMPT.format(
+        previous_queries=to_json(previous_queries),
+        suggested_topics=to_json(high_relevance_topics)
+    )
     #append_to_debug_file("PROMPT -----------")    
     #append_to_debug_file(prompt)
 
 
     response = anthropic_client.messages.create(
         model="claude-3-5-haiku-20241022",
-        max_tokens=1000,
-        temperature=0.3,
-        system="You are a helpful research assistant that generates effective follow-up search queries.",
+        max_tokens=300,
+        temperature=0.0,
+        system=cached_system("You are a helpful research assistant that generates effective follow-up search queries.", research_task),
         messages=[
             {"role": "user", "content": prompt}
         ]
     )
+    record_cache_usage(response.usage)
     
     result = response.content[0].text
 
@@ -189,21 +252,18 @@ def generate_follow_up_queries(anthropic_client: Any, research_task: Dict,
     #append_to_debug_file(result)
 
     
-    # Extract YAML content
-    if "```yaml" in result:
-        yaml_content = result.split("```yaml")[1].split("```")[0].strip()
-    elif "```" in result:
-        yaml_content = result.split("```")[1].strip()
-    else:
-        yaml_content = result.strip()
+    yaml_content = _extract_yaml(result)
     
     try:
-        queries_data = yaml.safe_load(yaml_content)
-        return [SearchQuery(**query) for query in queries_data]
+        queries_data = yaml.load(yaml_content, Loader=_YAML_LOADER)
+        queries = [SearchQuery(**query) for query in queries_data]
     except Exception as e:
         print(f"Error parsing Claude's follow-up query suggestions: {e}")
         print(f"Raw response: {result}")
         return []
+    
+    _store_queries(cache, cache_key, queries)
+    return queries
 
 def extract_topics_from_sources(sources: List[Source]) -> List[str]:
     """
@@ -219,15 +279,20 @@ def extract_topics_from_sources(sources: List[Source]) -> List[str]:
     for source in sources:
         if source.research_topics:
             # Split by bullet points and clean up
-            topics = source.research_topics.replace('•', '').split('\n')
-            topics = [t.strip() for t in topics if t.strip()]
-            all_topics.extend(topics)
+            all_topics.extend(source.topic_list())
     
-    # Remove duplicates while preserving order
+    # Remove duplicates (and topics contained in an earlier topic) while preserving order.
+    # Topics are compared as space-padded word sequences, so containment only matches
+    # whole words ("ai" is not contained in "email marketing").
     unique_topics = []
+    seen_topics = set()
+    kept_topics = []
     for topic in all_topics:
-        normalized_topic = ' '.join(topic.lower().split())
-        if not any(normalized_topic in ' '.join(t.lower().split()) for t in unique_topics):
-            unique_topics.append(topic)
+        normalized_topic = f" {' '.join(_TOPIC_WORD_RE.findall(topic.lower()))} "
+        if normalized_topic in seen_topics or any(normalized_topic in kept for kept in kept_topics):
+            continue
+        seen_topics.add(normalized_topic)
+        kept_topics.append(normalized_topic)
+        unique_topics.append(topic)
     
     return unique_topics
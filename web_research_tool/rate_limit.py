@@ -0,0 +1,89 @@
+"""
+Client-side rate limiting for the Google and Anthropic APIs.
+"""
+
+import time
+import threading
+from typing import Any
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+    
+    Tokens are added at a fixed rate up to a maximum burst size; each request
+    takes one token and waits if none is available. Concurrent callers are
+    therefore spread out instead of bursting into the API's rate limit.
+    """
+    
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Initialize the bucket.
+        
+        Args:
+            rate: Tokens added per second
+            burst: Maximum number of tokens that can accumulate
+            
+        Raises:
+            ValueError: If rate is not positive or burst is less than 1
+        """
+        if rate <= 0:
+            raise ValueError(f"Token bucket rate must be positive, got {rate}")
+        if burst < 1:
+            raise ValueError(f"Token bucket burst must be at least 1, got {burst}")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def take(self):
+        """Take a token, waiting until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class RateLimitedClient:
+    """
+    Wrapper around an Anthropic client that takes a token before every message request.
+    
+    All other attributes are passed through to the wrapped client.
+    """
+    
+    def __init__(self, client: Any, bucket: TokenBucket):
+        """
+        Wrap a client.
+        
+        Args:
+            client: Anthropic API client
+            bucket: Token bucket limiting the request rate
+        """
+        self._client = client
+        self.messages = _RateLimitedMessages(client.messages, bucket)
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+class _RateLimitedMessages:
+    """Rate-limited proxy for the client's messages resource."""
+    
+    def __init__(self, messages: Any, bucket: TokenBucket):
+        self._messages = messages
+        self._bucket = bucket
+    
+    def create(self, *args, **kwargs) -> Any:
+        self._bucket.take()
+        return self._messages.create(*args, **kwargs)
+    
+    def stream(self, *args, **kwargs) -> Any:
+        self._bucket.take()
+        return self._messages.stream(*args, **kwargs)
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._messages, name)
@@ -2,16 +2,63 @@
 Functions for performing Google searches.
 """
 
+import re
 import time
+import threading
 from typing import List, Dict, Optional
 from googleapiclient.discovery import build
+from googleapiclient.http import build_http
+from .cache import ResponseCache, make_key
+from .rate_limit import TokenBucket
+
+# Cached search results are reused for a day
+SEARCH_CACHE_TTL = 24 * 3600
+
+# A restriction to a single site, which the API can apply natively
+_SINGLE_SITE_RE = re.compile(r'^\s*site:(\S+)\s*$', re.IGNORECASE)
+
+# httplib2 connections are not thread-safe, so each thread executes requests on its own
+_thread_local = threading.local()
+
+def _thread_http():
+    """Get the HTTP connection object of the current thread."""
+    http = getattr(_thread_local, 'http', None)
+    if http is None:
+        http = _thread_local.http = build_http()
+    return http
+
+def _search_params(query: str, site_restrict: Optional[str]) -> Dict[str, str]:
+    """
+    Build the query parameters for a search with an optional site restriction.
+    
+    A single "site:example.com" restriction is passed as the API's siteSearch
+    parameter; anything more complex is appended to the query text.
+    
+    Args:
+        query: Search query string
+        site_restrict: Optional site restriction (e.g., "site:example.com")
+        
+    Returns:
+        Keyword arguments for cse().list()
+    """
+    if not site_restrict:
+        return {'q': query}
+    
+    match = _SINGLE_SITE_RE.match(site_restrict)
+    if match:
+        return {'q': query, 'siteSearch': match.group(1), 'siteSearchFilter': 'i'}
+    return {'q': f"{query} {site_restrict}"}
 
 def google_search(google_service, google_cse_id: str, query: str, 
                  site_restrict: Optional[str] = None, start_index: int = 1, 
-                 delay: float = 1.0, max_retries: int = 3) -> List[Dict]:
+                 delay: float = 1.0, max_retries: int = 3,
+                 cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[TokenBucket] = None) -> List[Dict]:
     """
     Perform a Google search using the Custom Search API with rate limiting and retries.
     
+    Safe to call from several threads at once with the same google_service.
+    
     Args:
         google_service: Google API service instance
         google_cse_id: Custom Search Engine ID
@@ -20,13 +67,20 @@ def google_search(google_service, google_cse_id: str, query: str,
         start_index: Starting index for pagination
         delay: Time to wait between requests in seconds
         max_retries: Maximum number of retry attempts
+        cache: Optional response cache to reuse results of identical searches
+        rate_limiter: Optional token bucket to take a token from before each request;
+            when given, it replaces the fixed delay after every request
         
     Returns:
         List of search result items
     """
-    full_query = query
-    if site_restrict:
-        full_query = f"{query} {site_restrict}"
+    params = _search_params(query, site_restrict)
+    
+    if cache is not None:
+        cache_key = make_key("google-v2", google_cse_id, params, start_index)
+        cached = cache.get("google", cache_key, ttl=SEARCH_CACHE_TTL)
+        if cached is not None:
+            return cached
     
     for attempt in range(max_retries):
         try:
@@ -36,18 +90,23 @@ def google_search(google_service, google_cse_id: str, query: str,
                 print(f"Retrying in {sleep_time:.2f} seconds (attempt {attempt+1}/{max_retries})...")
                 time.sleep(sleep_time)
             
+            if rate_limiter is not None:
+                rate_limiter.take()
+            
             result = google_service.cse().list(
-                q=full_query,
                 cx=google_cse_id,
-                start=start_index
-            ).execute()
+                start=start_index,
+                **params
+            ).execute(http=_thread_http())
             
             # Add a small delay to avoid hitting rate limits
-            time.sleep(delay)
+            if rate_limiter is None:
+                time.sleep(delay)
             
-            if 'items' in result:
-                return result['items']
-            return []
+            items = result.get('items', [])
+            if cache is not None:
+                cache.set("google", cache_key, items)
+            return items
             
         except Exception as e:
             if "quota" in str(e).lower() and attempt < max_retries - 1:
@@ -3,19 +3,167 @@ Functions for evaluating source relevance.
 """
 
 import re
-import json
-import time
-from typing import Dict, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Set, Tuple
 import anthropic
+from .cache import ResponseCache, make_key
+from .chunking import split_into_chunks
+from .claude import cached_system, record_cache_usage
 from .models import Source
 
+# Cached relevance evaluations are reused for a week
+RELEVANCE_CACHE_TTL = 7 * 24 * 3600
+
+# Summary returned when the Claude request fails; such results are not cached
+_ERROR_SUMMARY = "Error generating summary."
+
+# API errors that still fail after the client's own retries and only cost the
+# affected sources their evaluation. Anything else (bad requests, SDK mismatches,
+# programming errors) would fail for every source and is raised instead.
+_TRANSIENT_API_ERRORS = (
+    anthropic.APIConnectionError,
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+)
+
+# Documents shorter than this are evaluated in a single request instead of in chunks
+DIRECT_EVALUATION_LENGTH = 12000
+
+# Maximum length of the content included in a single evaluation prompt
+MAX_CONTENT_LENGTH = 8000
+
+# Appended to content that was cut to MAX_CONTENT_LENGTH
+_TRUNCATION_NOTE = "... [content truncated due to length]"
+
+# Maximum number of short documents evaluated together in one request
+MAX_BATCH_SIZE = 5
+
+# Sources with less extracted text than this are not worth a Claude request
+MIN_CONTENT_LENGTH = 200
+
+# Number of content characters searched for research task keywords by the pre-filter
+PREFILTER_TEXT_LENGTH = 5000
+
+# Research task fields whose words are used as pre-filter keywords
+_KEYWORD_FIELDS = ('topic', 'objective', 'context', 'expected_output')
+
+# Common words that say nothing about whether a source is on topic
+_STOPWORDS = frozenset("""
+    about also based been being between could does each find focus from have include
+    information into latest more most other over recent research should some source
+    sources specific such than that their them then there these they this those
+    through understand under using what when where which while will with would your
+""".split())
+
+_WORD_RE = re.compile(r'[a-z0-9]{4,}')
+
+# Plural endings and their singular replacements ("policies" -> "policy",
+# "classes" -> "class", "sources" -> "source"); words ending in "ss" or "us" are left alone
+_PLURAL_RE = re.compile(r'(?:(?<=[^aeiou])ies|(?<=ss|sh|ch)es|(?<=[xz])es|(?<=[^su])s)$')
+_PLURAL_REPLACEMENTS = {'ies': 'y', 'es': '', 's': ''}
+
+SCORING_INSTRUCTIONS = """
+    1. RELEVANCE SCORE: Evaluate how relevant this source is to the research task on a scale from 0.0 to 1.0:
+    - 0.0: Completely irrelevant
+    - 0.3: Tangentially related but not useful
+    - 0.5: Somewhat relevant
+    - 0.7: Relevant with good information
+    - 0.9-1.0: Highly relevant, exactly what we need
+    
+    2. SUMMARY: Provide a very concise 3-bullet summary of the key points in this content relevant to the research task.
+    
+    3. RESEARCH TOPICS: Suggest 2-3 potential follow-up research topics or questions based on this content.
+"""
+
+# System instructions of every evaluation request. They are the same for single and
+# batched evaluations, so they belong to the prompt-cached prefix.
+_EVALUATION_INSTRUCTIONS = f"""
+    You evaluate source relevance and provide concise summaries.
+    
+    For each source or excerpt you are given, I need three pieces of information:
+    {SCORING_INSTRUCTIONS}
+"""
+
+# Tool that Claude is required to call with its evaluations, so the reply is structured
+# data instead of free text that has to be parsed
+_EVALUATION_TOOL = {
+    "name": "record_evaluations",
+    "description": "Record the relevance evaluation of each evaluated source or excerpt.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "evaluations": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "number": {"type": "integer", "description": "Number of the evaluated source or excerpt (1 if only one was given)"},
+                        "score": {"type": "number", "description": "Relevance score between 0.0 and 1.0"},
+                        "summary": {"type": "string", "description": "Key points, one per line, each starting with •"},
+                        "topics": {"type": "string", "description": "Research topics, one per line, each starting with •"}
+                    },
+                    "required": ["number", "score", "summary", "topics"]
+                }
+            }
+        },
+        "required": ["evaluations"]
+    }
+}
+
 def evaluate_source_relevance(anthropic_client: Any, source: Source, research_task: Dict, 
-                             verbose: bool = False) -> Tuple[float, str, str]:
+                             verbose: bool = False,
+                             cache: Optional[ResponseCache] = None) -> Tuple[float, str, str]:
     """
     Use Claude to evaluate the relevance of a source to the research task.
     Also returns a short summary and potential research topics.
     Processes the entire document, chunking if necessary for large documents.
     
+    Args:
+        anthropic_client: Anthropic API client
+        source: Source object with content
+        research_task: Dictionary containing research task details
+        verbose: Whether to print detailed information
+        cache: Optional response cache to reuse evaluations from earlier runs
+        
+    Returns:
+        Tuple of (relevance_score, short_summary, research_topics)
+    """
+    if cache is None:
+        return _evaluate_source_relevance(anthropic_client, source, research_task, verbose)
+    
+    cached = _get_cached_evaluation(cache, source, research_task, verbose)
+    if cached is not None:
+        return cached
+    
+    result = _evaluate_source_relevance(anthropic_client, source, research_task, verbose)
+    _store_evaluation(cache, source, research_task, result)
+    return result
+
+def _evaluation_cache_key(source: Source, research_task: Dict) -> str:
+    """Build the response cache key for a source evaluation."""
+    return make_key("relevance-v1", research_task, source.url, source.title, source.snippet, source.content)
+
+def _get_cached_evaluation(cache: ResponseCache, source: Source, research_task: Dict,
+                           verbose: bool = False) -> Optional[Tuple[float, str, str]]:
+    """Return a cached evaluation for a source, or None if there is none."""
+    cached = cache.get("relevance", _evaluation_cache_key(source, research_task), ttl=RELEVANCE_CACHE_TTL)
+    if cached is None:
+        return None
+    if verbose:
+        print(f"Using cached relevance evaluation for {source.url}")
+    return tuple(cached)
+
+def _store_evaluation(cache: ResponseCache, source: Source, research_task: Dict,
+                      result: Tuple[float, str, str]):
+    """Store a successful evaluation in the cache."""
+    if _ERROR_SUMMARY not in result[1]:
+        cache.set("relevance", _evaluation_cache_key(source, research_task), list(result))
+
+def _evaluate_source_relevance(anthropic_client: Any, source: Source, research_task: Dict,
+                               verbose: bool = False) -> Tuple[float, str, str]:
+    """
+    Evaluate the relevance of a source with Claude, chunking large documents.
+    
     Args:
         anthropic_client: Anthropic API client
         source: Source object with content
@@ -38,45 +186,42 @@ def evaluate_source_relevance(anthropic_client: Any, source: Source, research_ta
 
 
     # If content is short enough, analyze it directly
-    if len(full_content) < 12000:  # Claude Haiku has ~16K token limit
+    if len(full_content) < DIRECT_EVALUATION_LENGTH:
         return _evaluate_content_chunk(anthropic_client, source, full_content, research_task)
     else:
         # For longer documents, we'll analyze in chunks and combine scores
         if verbose:
             print(f"Document is large ({len(full_content)} chars), analyzing in chunks...")
         
-        # Split into chunks with some overlap
-        chunk_size = 10000
-        overlap = 1000
-        chunks = []
-        
-        for i in range(0, len(full_content), chunk_size - overlap):
-            chunk = full_content[i:i + chunk_size]
-            chunks.append(chunk)
+        # Split into chunks at sentence boundaries, small enough to be sent without truncation
+        chunks = split_into_chunks(full_content, MAX_CONTENT_LENGTH)
             
-        # Analyze each chunk
-        chunk_scores = []
-        chunk_summaries = []
-        chunk_topics = []
+        # Analyze all chunks in a single request
+        if verbose:
+            print(f"Analyzing {len(chunks)} chunks...")
+        chunk_results = _evaluate_chunks_batch(anthropic_client, source, chunks, research_task)
         
-        for i, chunk in enumerate(chunks):
-            if verbose:
-                print(f"Analyzing chunk {i+1}/{len(chunks)}...")
-            
-            score, summary, topics = _evaluate_content_chunk(
-                anthropic_client, 
-                source, 
-                chunk, 
-                research_task, 
-                is_chunk=True, 
-                chunk_info=f"Chunk {i+1} of {len(chunks)}"
-            )
-            chunk_scores.append(score)
-            chunk_summaries.append(summary)
-            chunk_topics.append(topics)
-            
-            # Add a small delay to avoid rate limiting
-            time.sleep(0.5)
+        # Analyze any chunk missing from the batch response individually, in parallel
+        missing = [i for i, result in enumerate(chunk_results) if result is None]
+        if missing:
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                individual_results = executor.map(
+                    lambda i: _evaluate_content_chunk(
+                        anthropic_client, 
+                        source, 
+                        chunks[i], 
+                        research_task, 
+                        is_chunk=True, 
+                        chunk_info=f"Chunk {i+1} of {len(chunks)}"
+                    ),
+                    missing
+                )
+                for i, result in zip(missing, individual_results):
+                    chunk_results[i] = result
+        
+        chunk_scores = [score for score, _, _ in chunk_results]
+        chunk_summaries = [summary for _, summary, _ in chunk_results]
+        chunk_topics = [topics for _, _, topics in chunk_results]
         
         # Combine scores - we'll take a weighted average that prioritizes 
         # the highest scores since relevant sections are most important
@@ -103,6 +248,255 @@ def evaluate_source_relevance(anthropic_client: Any, source: Source, research_ta
             
         return final_score, final_summary, final_topics
 
+def evaluate_sources_relevance(anthropic_client: Any, sources: List[Source], research_task: Dict,
+                               verbose: bool = False, max_workers: int = 8,
+                               cache: Optional[ResponseCache] = None) -> List[Tuple[float, str, str]]:
+    """
+    Evaluate the relevance of several sources with as few Claude round-trips as possible.
+    
+    Short documents are scored together in a single request. Large documents,
+    and any source missing from a batch response, are evaluated individually
+    in parallel threads.
+    
+    Args:
+        anthropic_client: Anthropic API client
+        sources: Source objects with content
+        research_task: Dictionary containing research task details
+        verbose: Whether to print detailed information
+        max_workers: Maximum number of concurrent evaluations
+        cache: Optional response cache to reuse evaluations from earlier runs
+        
+    Returns:
+        List of (relevance_score, short_summary, research_topics) tuples in the same order as sources
+    """
+    results = [None] * len(sources)
+    
+    # Reuse cached evaluations first
+    if cache is not None:
+        for i, source in enumerate(sources):
+            results[i] = _get_cached_evaluation(cache, source, research_task, verbose)
+    
+    # Reject obviously irrelevant sources without asking Claude
+    keywords = _task_keywords(research_task)
+    for i, source in enumerate(sources):
+        if results[i] is None:
+            results[i] = _prefilter_source(source, keywords)
+            if results[i] is not None and verbose:
+                print(f"Pre-filter rejected {source.url}: {results[i][1]}")
+    
+    # Score the short documents together
+    short_indices = [i for i, source in enumerate(sources)
+                     if results[i] is None and len(source.content) < DIRECT_EVALUATION_LENGTH]
+    for start in range(0, len(short_indices), MAX_BATCH_SIZE):
+        batch_indices = short_indices[start:start + MAX_BATCH_SIZE]
+        if len(batch_indices) < 2:
+            continue
+        if verbose:
+            print(f"Evaluating {len(batch_indices)} sources in a single request...")
+        
+        batch_results = _evaluate_sources_batch(
+            anthropic_client, [sources[i] for i in batch_indices], research_task
+        )
+        for i, result in zip(batch_indices, batch_results):
+            if result is not None:
+                results[i] = result
+                if cache is not None:
+                    _store_evaluation(cache, sources[i], research_task, result)
+    
+    # Evaluate everything else individually
+    remaining = [i for i in range(len(sources)) if results[i] is None]
+    if remaining:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(remaining))) as executor:
+            individual_results = executor.map(
+                lambda i: evaluate_source_relevance(anthropic_client, sources[i], research_task, verbose, cache),
+                remaining
+            )
+            for i, result in zip(remaining, individual_results):
+                results[i] = result
+    
+    return results
+
+def _task_keywords(research_task: Dict) -> Set[str]:
+    """
+    Collect the distinctive words of the research task for the pre-filter.
+    
+    Args:
+        research_task: Dictionary containing research task details
+        
+    Returns:
+        Set of lowercase keywords, matched as substrings of the source text
+    """
+    text = " ".join(str(research_task.get(field, "")) for field in _KEYWORD_FIELDS).lower()
+    keywords = set()
+    for word in _WORD_RE.findall(text):
+        if word not in _STOPWORDS:
+            # Keep the word and its singular form, so both plural and singular mentions
+            # in the source match, even for irregular plurals ("series")
+            keywords.add(word)
+            keywords.add(_PLURAL_RE.sub(lambda match: _PLURAL_REPLACEMENTS[match.group()], word))
+    return keywords
+
+def _prefilter_source(source: Source, keywords: Set[str]) -> Optional[Tuple[float, str, str]]:
+    """
+    Cheaply reject sources that cannot be relevant.
+    
+    A source is rejected if it has almost no text (e.g. a parked domain or an
+    empty page) or if none of the research task keywords appear in its title,
+    snippet or the beginning of its content. Everything else is left for Claude.
+    
+    Args:
+        source: Source object with content
+        keywords: Research task keywords (see _task_keywords)
+        
+    Returns:
+        A zero-relevance evaluation for rejected sources, or None
+    """
+    if len(source.content.strip()) < MIN_CONTENT_LENGTH:
+        return 0.0, "Skipped: too little text was extracted from this source.", ""
+    
+    if keywords:
+        text = f"{source.title} {source.snippet} {source.content[:PREFILTER_TEXT_LENGTH]}".lower()
+        if not any(keyword in text for keyword in keywords):
+            return 0.0, "Skipped: this source does not mention any keywords of the research task.", ""
+    
+    return None
+
+def _evaluate_sources_batch(anthropic_client: Any, sources: List[Source],
+                            research_task: Dict) -> List[Optional[Tuple[float, str, str]]]:
+    """
+    Evaluate several short sources with a single Claude request.
+    
+    Args:
+        anthropic_client: Anthropic API client
+        sources: Source objects with short content
+        research_task: Research task details
+        
+    Returns:
+        List of (relevance_score, short_summary, research_topics) tuples in the same
+        order as sources, with None for sources that could not be evaluated
+    """
+    source_sections = []
+    for i, source in enumerate(sources):
+        source_sections.append(f"""
+    SOURCE [{i+1}]
+    Title: {source.title}
+    URL: {source.url}
+    Snippet: {source.snippet}
+    
+    DOCUMENT CONTENT:
+    {_truncate_content(source.content)}
+    """)
+    
+    prompt = f"""
+    You are evaluating the relevance of {len(sources)} sources for a research task.
+    
+    The research task is described in the system prompt.
+    {"".join(source_sections)}
+    Evaluate EACH source as described in the system prompt.
+    Record one evaluation per source with the {_EVALUATION_TOOL["name"]} tool, numbered as above.
+    """
+    
+    try:
+        return _request_evaluations(anthropic_client, prompt, len(sources), research_task)
+    except _TRANSIENT_API_ERRORS as e:
+        print(f"Error evaluating sources in batch: {e}")
+        return [None] * len(sources)
+
+def _evaluate_chunks_batch(anthropic_client: Any, source: Source, chunks: List[str],
+                           research_task: Dict) -> List[Optional[Tuple[float, str, str]]]:
+    """
+    Evaluate all chunks of a large document with a single Claude request.
+    
+    Args:
+        anthropic_client: Anthropic API client
+        source: Source object the chunks belong to
+        chunks: Consecutive chunks of the document content
+        research_task: Research task details
+        
+    Returns:
+        List of (relevance_score, short_summary, research_topics) tuples in the same
+        order as chunks, with None for chunks that could not be evaluated
+    """
+    chunk_sections = []
+    for i, chunk in enumerate(chunks):
+        chunk_sections.append(f"""
+    EXCERPT [{i+1}]
+    {_truncate_content(chunk)}
+    """)
+    
+    prompt = f"""
+    You are evaluating the relevance of {len(chunks)} consecutive excerpts of one source for a research task.
+    
+    The research task is described in the system prompt.
+    
+    SOURCE DETAILS:
+    Title: {source.title}
+    URL: {source.url}
+    Snippet: {source.snippet}
+    {"".join(chunk_sections)}
+    Evaluate EACH excerpt as described in the system prompt.
+    Record one evaluation per excerpt with the {_EVALUATION_TOOL["name"]} tool, numbered as above.
+    """
+    
+    try:
+        return _request_evaluations(anthropic_client, prompt, len(chunks), research_task)
+    except _TRANSIENT_API_ERRORS as e:
+        print(f"Error evaluating chunks in batch: {e}")
+        return [None] * len(chunks)
+
+def _request_evaluations(anthropic_client: Any, prompt: str, count: int,
+                         research_task: Dict) -> List[Optional[Tuple[float, str, str]]]:
+    """
+    Send an evaluation prompt and read the evaluations from Claude's tool call.
+    
+    Args:
+        anthropic_client: Anthropic API client
+        prompt: Evaluation prompt for one or more numbered items
+        count: Number of items that are evaluated
+        research_task: Research task details
+        
+    Returns:
+        List of (relevance_score, short_summary, research_topics) tuples,
+        with None for items missing from the response
+    """
+    response = anthropic_client.messages.create(
+        model="claude-3-5-haiku-20241022",
+        max_tokens=500 * count,
+        temperature=0.0,
+        system=cached_system(_EVALUATION_INSTRUCTIONS, research_task),
+        tools=[_EVALUATION_TOOL],
+        tool_choice={"type": "tool", "name": _EVALUATION_TOOL["name"]},
+        messages=[
+            {"role": "user", "content": prompt}
+        ]
+    )
+    record_cache_usage(response.usage)
+    
+    results = [None] * count
+    for block in response.content:
+        if getattr(block, 'type', None) != 'tool_use':
+            continue
+        for item in block.input.get('evaluations', []):
+            try:
+                number = int(item['number'])
+                score = float(item['score'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 1 <= number <= count:
+                # Ensure the score is between 0 and 1
+                results[number - 1] = (
+                    max(0.0, min(score, 1.0)),
+                    str(item.get('summary', '')).strip() or "No summary available.",
+                    str(item.get('topics', '')).strip() or "No research topics suggested."
+                )
+    return results
+
+def _truncate_content(content: str) -> str:
+    """Truncate content to the maximum length sent in an evaluation prompt."""
+    if len(content) > MAX_CONTENT_LENGTH:
+        return content[:MAX_CONTENT_LENGTH] + _TRUNCATION_NOTE
+    return content
+
 def _evaluate_content_chunk(anthropic_client: Any, source: Source, content: str, 
                            research_task: Dict, is_chunk: bool = False,
                            chunk_info: str = "") -> Tuple[float, str, str]:
@@ -123,17 +517,12 @@ def _evaluate_content_chunk(anthropic_client: Any, source: Source, content: str,
     chunk_context = f"\nThis is {chunk_info} from the full document." if is_chunk else ""
     
     # Truncate content if it's too long to avoid API errors
-    MAX_CONTENT_LENGTH = 8000
-    if len(content) > MAX_CONTENT_LENGTH:
-        truncated_content = content[:MAX_CONTENT_LENGTH] + "... [content truncated due to length]"
-    else:
-        truncated_content = content
+    truncated_content = _truncate_content(content)
     
     prompt = f"""
     You are evaluating the relevance of a source for a research task.
     
-    RESEARCH TASK:
-    {json.dumps(research_task, indent=2)}
+    The research task is described in the system prompt.
     
     SOURCE DETAILS:
     Title: {source.title}
@@ -143,64 +532,16 @@ def _evaluate_content_chunk(anthropic_client: Any, source: Source, content: str,
     DOCUMENT CONTENT:
     {truncated_content}
     
-    I need three pieces of information:
-    
-    1. RELEVANCE SCORE: Evaluate how relevant this source is to the research task on a scale from 0.0 to 1.0:
-    - 0.0: Completely irrelevant
-    - 0.3: Tangentially related but not useful
-    - 0.5: Somewhat relevant
-    - 0.7: Relevant with good information
-    - 0.9-1.0: Highly relevant, exactly what we need
-    
-    2. SUMMARY: Provide a very concise 3-bullet summary of the key points in this content relevant to the research task.
-    
-    3. RESEARCH TOPICS: Suggest 2-3 potential follow-up research topics or questions based on this content.
-    
-    FORMAT YOUR RESPONSE EXACTLY LIKE THIS:
-    SCORE: [number between 0.0 and 1.0]
-    
-    SUMMARY:
-    • [First key point]
-    • [Second key point]
-    • [Third key point]
-    
-    TOPICS:
-    • [First research topic]
-    • [Second research topic]
-    • [Third research topic]
+    Evaluate the content as described in the system prompt.
+    Record your evaluation with the {_EVALUATION_TOOL["name"]} tool.
     """
     
     try:
-        response = anthropic_client.messages.create(
-            model="claude-3-5-haiku-20241022",
-            max_tokens=500,
-            temperature=0.0,
-            system="You evaluate source relevance and provide concise summaries.",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        result = response.content[0].text.strip()
-        
-        # Extract the score
-        score_match = re.search(r'SCORE:\s*(\d+\.\d+|\d+)', result)
-        if score_match:
-            score = float(score_match.group(1))
-            # Ensure the score is between 0 and 1
-            score = max(0.0, min(score, 1.0))
-        else:
-            print(f"Could not extract score from Claude's response: {result}")
-            score = 0.5  # Default to neutral relevance
-        
-        # Extract the summary and topics
-        summary_match = re.search(r'SUMMARY:(.*?)TOPICS:', result, re.DOTALL)
-        topics_match = re.search(r'TOPICS:(.*)', result, re.DOTALL)
-        
-        summary = summary_match.group(1).strip() if summary_match else "No summary available."
-        topics = topics_match.group(1).strip() if topics_match else "No research topics suggested."
-        
-        return score, summary, topics
-    except Exception as e:
+        result = _request_evaluations(anthropic_client, prompt, 1, research_task)[0]
+        if result is None:
+            print(f"Could not extract an evaluation from Claude's response for {source.url}")
+            return 0.5, "No summary available.", "No research topics suggested."  # Default to neutral relevance
+        return result
+    except _TRANSIENT_API_ERRORS as e:
         print(f"Error evaluating source relevance: {e}")
-        return 0.5, "Error generating summary.", "Error generating research topics."
\ No newline at end of file
+        return 0.5, _ERROR_SUMMARY, "Error generating research topics."
\ No newline at end of file
@@ -2,12 +2,134 @@
 Functions for summarizing research findings.
 """
 
-import json
-from typing import Dict, List, Any
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional
+from .cache import ResponseCache, make_key
+from .chunking import estimate_tokens, split_into_token_chunks
+from .claude import cached_system, record_cache_usage, stream_text, to_json
 from .models import Source
 
+# Model for source and chunk summaries, and for the research summary unless a
+# separate synthesis model is chosen
+DEFAULT_SUMMARY_MODEL = "claude-3-5-haiku-20241022"
+
+# Maximum number of concurrent Claude requests when summarizing sources or chunks
+MAX_SUMMARY_WORKERS = 4
+
+# Sources longer than this many estimated tokens are summarized in chunks (about 20K
+# characters of English text)
+SUMMARY_CHUNK_TOKENS = 5000
+
+# Estimated tokens per chunk of a chunked source (about 18K characters of English text)
+SUMMARY_CHUNK_SIZE_TOKENS = 4500
+
+# Smallest output budget of a source or chunk summary request; larger inputs get
+# one output token per two estimated input tokens, up to the request's own limit.
+# Summaries cut off by this budget are requested again with the full limit.
+MIN_SUMMARY_TOKENS = 1024
+
+# Cached detailed source summaries are reused for a week
+SOURCE_SUMMARY_CACHE_TTL = 7 * 24 * 3600
+
+# Prompt for the research summary, formatted with the JSON source list
+_RESEARCH_SUMMARY_PROMPT = """
+    You are a research assistant summarizing findings from web research.
+    
+    The research task is described in the system prompt.
+    
+    SOURCES FOUND:
+    {source_list}
+    
+    Please provide a comprehensive research summary that:
+    1. Provides an overview of the topic and key findings
+    2. Highlights the most important information from the sources
+    3. Notes any gaps or areas for further research
+    
+    FORMAT:
+    - Start with an "Executive Summary" (2-3 paragraphs)
+    - Include a "Key Findings" section with the most important information
+    - Whenever you reference information from a specific source, include the source number in brackets, e.g., [1], [3]
+    - Include a brief "Sources" section that lists ONLY the numbered references and their URLs (detailed summaries will be added separately)
+    - End with "Suggested Next Steps" for further research
+    
+    IMPORTANT:
+    - Refer to sources by their number throughout your summary (e.g., "According to Source [3]...")
+    - Your executive summary and key findings should reference the source numbers to support claims
+    - Do NOT include the detailed source summaries - these will be appended separately
+    
+    YOUR RESPONSE SHOULD BE WELL-FORMATTED AND READY TO PRESENT TO THE USER.
+    """
+
+# Prompt summarizing one chunk of a large document
+_CHUNK_SUMMARY_PROMPT = """
+            You are summarizing a portion of a document for research purposes.
+            
+            The research task is described in the system prompt.
+            
+            SOURCE:
+            Title: {title}
+            URL: {url}
+            
+            This is chunk {number} of {count} from the document.
+            
+            DOCUMENT CHUNK CONTENT:
+            {chunk}
+            
+            Provide a comprehensive and detailed summary of the key information in this document chunk 
+            that is relevant to the research task. Be thorough in capturing facts, data, statistics, 
+            methodology, findings, conclusions, and insights. Include specific details where possible.
+            """
+
+# Prompt combining the chunk summaries of a large document into one summary
+_UNIFIED_SOURCE_SUMMARY_PROMPT = """
+        You are creating a unified summary of a document based on summaries of different chunks.
+        
+        The research task is described in the system prompt.
+        
+        SOURCE:
+        Title: {title}
+        URL: {url}
+        
+        SHORT SUMMARY:
+        {short_summary}
+        
+        CHUNK SUMMARIES:
+        {chunk_summaries}
+        
+        Create a comprehensive and detailed unified summary of this document that captures all the key 
+        information from the different chunks that is relevant to the research task. Include specific 
+        facts, figures, methodology, and conclusions. Be thorough while still eliminating redundancies 
+        and organizing the information logically. Your summary should be substantial enough to give readers
+        a complete understanding of the document's relevant content.
+        """
+
+# Prompt summarizing a document that fits in a single request
+_SOURCE_SUMMARY_PROMPT = """
+        You are summarizing a document for research purposes.
+        
+        The research task is described in the system prompt.
+        
+        SOURCE:
+        Title: {title}
+        URL: {url}
+        
+        SHORT SUMMARY:
+        {short_summary}
+        
+        DOCUMENT CONTENT:
+        {content}
+        
+        Provide a comprehensive and detailed summary of the key information in this document
+        that is relevant to the research task. Be thorough in capturing facts, data, statistics, 
+        methodology, findings, conclusions, and insights. Include specific details where possible.
+        Your summary should be substantial enough to give readers a complete understanding of 
+        the document's relevant content.
+        """
+
 def summarize_findings(anthropic_client: Any, research_task: Dict, sources: List[Source],
-                       verbose: bool = False) -> str:
+                       verbose: bool = False, cache: Optional[ResponseCache] = None,
+                       synthesis_model: Optional[str] = None) -> str:
     """
     Use Claude to generate a summary of the research findings.
     Ensures all sources and their individual summaries are included in the final report.
@@ -17,116 +139,46 @@ def summarize_findings(anthropic_client: Any, research_task: Dict, sources: List
         research_task: Dictionary containing research task details
         sources: List of sources found
         verbose: Whether to print detailed information
+        cache: Optional response cache to reuse source summaries from earlier runs
+        synthesis_model: Optional model for the final research summary (e.g. a Sonnet model
+            for higher quality); the many per-source summaries always use DEFAULT_SUMMARY_MODEL
         
     Returns:
         Summary of the research findings
     """
-    # First pass: Create individual source summaries
+    # First pass: Create individual source summaries for documents that do not have one yet.
+    # Sources with identical content (e.g. mirrors of the same page) share a single summary
+    pending = {}
     for i, source in enumerate(sources):
-        if verbose:
-            print(f"Processing source {i+1}/{len(sources)}: {source.title}")
-            
-        # For all documents, generate a detailed summary if not already present
         if not source.detailed_summary:
-            if len(source.content) > 20000:
-                if verbose:
-                    print(f"Generating detailed summary for large source {i+1}: {source.title}")
-                
-                source.detailed_summary = _generate_source_summary(anthropic_client, source, research_task)
-            else:
-                # For shorter documents, still generate a detailed summary
-                source.detailed_summary = _generate_source_summary(anthropic_client, source, research_task)
-    
-    # Generate the main research summary (executive summary, key findings, etc.)
-    return _generate_research_summary(anthropic_client, research_task, sources)
-
-
-def _batch_process_summaries(anthropic_client: Any, research_task: Dict, 
-                            sources: List[Source], batch_size: int,
-                            verbose: bool = False) -> str:
-    """
-    Process a large number of sources in batches to generate summaries,
-    then combine them into a final research summary.
+            content_hash = hashlib.blake2b(source.content.encode('utf-8'), digest_size=16).digest()
+            pending.setdefault(content_hash, []).append(i)
     
-    Args:
-        anthropic_client: Anthropic API client
-        research_task: Dictionary containing research task details
-        sources: List of Source objects
-        batch_size: Maximum number of sources to process in a single batch
-        verbose: Whether to print detailed information
-        
-    Returns:
-        Combined research summary
-    """
-    # Sort sources by relevance
-    sorted_sources = sorted(sources, key=lambda s: s.relevance_score, reverse=True)
-    
-    # Process in batches
-    batch_summaries = []
-    for i in range(0, len(sorted_sources), batch_size):
-        batch = sorted_sources[i:i+batch_size]
+    # The documents are independent, so they are summarized in parallel
+    def summarize_source(indices: List[int]):
+        i = indices[0]
+        source = sources[i]
         if verbose:
-            print(f"Processing batch {i//batch_size + 1} with sources {i+1}-{min(i+batch_size, len(sorted_sources))}")
-        
-        # Generate summary for this batch
-        batch_summary = _generate_research_summary(
-            anthropic_client, 
-            research_task, 
-            batch,
-            is_batch=True,
-            batch_info=f"Batch {i//batch_size + 1}/{(len(sorted_sources) + batch_size - 1)//batch_size}"
-        )
+            print(f"Processing source {i+1}/{len(sources)}: {source.title}")
+            if estimate_tokens(source.content) > SUMMARY_CHUNK_TOKENS:
+                print(f"Generating detailed summary for large source {i+1}: {source.title}")
         
-        batch_summaries.append(batch_summary)
-    
-    # Combine batch summaries into a final summary
-    combined_summary = "\n\n".join(batch_summaries)
-    
-    # Generate a final integrated summary
-    final_prompt = f"""
-    You are a research assistant creating a unified research summary from multiple batch summaries.
+        summary = _cached_source_summary(anthropic_client, source, research_task, cache)
+        for j in indices:
+            sources[j].detailed_summary = summary
     
-    RESEARCH TASK:
-    {json.dumps(research_task, indent=2)}
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(MAX_SUMMARY_WORKERS, len(pending))) as executor:
+            list(executor.map(summarize_source, pending.values()))
     
-    BATCH SUMMARIES:
-    {combined_summary}
-    
-    Please integrate these batch summaries into a single coherent research summary. 
-    
-    Your final summary MUST include:
-    1. An executive summary (2-3 paragraphs)
-    2. A "Key Findings" section with the most important information
-    3. A "Sources" section that lists ALL sources from ALL batches with:
-       - Full URL of each source
-       - Relevance score
-       - Comprehensive description (1-2 paragraphs minimum per source)
-    4. "Suggested Next Steps" for further research
-    
-    Make sure NO sources are omitted - you must include EVERY source from ALL batches.
-    
-    FORMAT your response to be well-organized with clear sections and subsections.
-    """
-    
-    if verbose:
-        print("Generating final integrated summary from all batches...")
-    
-    response = anthropic_client.messages.create(
-        model="claude-3-5-haiku-20241022",
-        max_tokens=8000,  # Increased for comprehensive summary
-        temperature=0.2,
-        system="You are a helpful research assistant creating a comprehensive integrated research summary.",
-        messages=[
-            {"role": "user", "content": final_prompt}
-        ]
-    )
-    
-    return response.content[0].text
+    # Generate the main research summary (executive summary, key findings, etc.)
+    return _generate_research_summary(anthropic_client, research_task, sources, verbose=verbose,
+                                      model=synthesis_model or DEFAULT_SUMMARY_MODEL)
 
 
 def _generate_research_summary(anthropic_client: Any, research_task: Dict, 
-                             sources: List[Source], is_batch: bool = False, 
-                             batch_info: str = "") -> str:
+                             sources: List[Source], verbose: bool = False,
+                             model: str = DEFAULT_SUMMARY_MODEL) -> str:
     """
     Generate a research summary that includes executive summary, key findings,
     and references to the numbered source list.
@@ -135,14 +187,12 @@ def _generate_research_summary(anthropic_client: Any, research_task: Dict,
         anthropic_client: Anthropic API client
         research_task: Dictionary containing research task details
         sources: List of Source objects
-        is_batch: Whether this is processing a batch of a larger set
-        batch_info: Information about the batch position
+        verbose: Whether to print the summary as it is generated
+        model: Claude model that writes the summary
         
     Returns:
         Research summary
     """
-    batch_context = f"\nThis is {batch_info} of sources being processed." if is_batch else ""
-    
     # Include essential source info for the main summary generation
     source_ref_list = []
     for i, src in enumerate(sources):
@@ -159,72 +209,123 @@ def _generate_research_summary(anthropic_client: Any, research_task: Dict,
             
         source_ref_list.append(source_info)
     
-    prompt = f"""
-    You are a research assistant summarizing findings from web research.{batch_context}
-    
-    RESEARCH TASK:
-    {json.dumps(research_task, indent=2)}
-    
-    SOURCES FOUND:
-    {json.dumps(source_ref_list, indent=2)}
-    
-    Please provide a comprehensive research summary that:
-    1. Provides an overview of the topic and key findings
-    2. Highlights the most important information from the sources
-    3. Notes any gaps or areas for further research
-    
-    FORMAT:
-    - Start with an "Executive Summary" (2-3 paragraphs)
-    - Include a "Key Findings" section with the most important information
-    - Whenever you reference information from a specific source, include the source number in brackets, e.g., [1], [3]
-    - Include a brief "Sources" section that lists ONLY the numbered references and their URLs (detailed summaries will be added separately)
-    - End with "Suggested Next Steps" for further research
-    
-    IMPORTANT:
-    - Refer to sources by their number throughout your summary (e.g., "According to Source [3]...")
-    - Your executive summary and key findings should reference the source numbers to support claims
-    - Do NOT include the detailed source summaries - these will be appended separately
-    
-    YOUR RESPONSE SHOULD BE WELL-FORMATTED AND READY TO PRESENT TO THE USER.
-    """
+    prompt = _RESEARCH_SUMMARY_PROMPT.format(
+        source_list=to_json(source_ref_list)
+    )
     
-    response = anthropic_client.messages.create(
-        model="claude-3-5-haiku-20241022",
+    # Stream the main summary so long generations show progress in verbose mode
+    main_summary = stream_text(
+        anthropic_client,
+        echo=verbose,
+        model=model,
         max_tokens=4000,
         temperature=0.2,
-        system="You are a helpful research assistant summarizing web research findings.",
+        system=cached_system("You are a helpful research assistant summarizing web research findings.", research_task),
         messages=[
             {"role": "user", "content": prompt}
         ]
     )
     
-    # Get the main summary
-    main_summary = response.content[0].text
-    
-    # Now append the detailed source summaries
-    source_detail_section = "\n\n## Detailed Source Summaries\n\n"
+    # Now append the detailed source summaries, collected as parts and joined once
+    source_detail_parts = ["\n\n## Detailed Source Summaries\n\n"]
     for i, src in enumerate(sources):
-        source_detail_section += f"### Source [{i+1}]: {src.title}\n"
-        source_detail_section += f"**URL:** {src.url}\n"
-        source_detail_section += f"**Relevance Score:** {src.relevance_score:.2f}\n\n"
+        source_detail_parts.append(f"### Source [{i+1}]: {src.title}\n")
+        source_detail_parts.append(f"**URL:** {src.url}\n")
+        source_detail_parts.append(f"**Relevance Score:** {src.relevance_score:.2f}\n\n")
         
         # Use detailed summary if available, otherwise use the short summary
         if src.detailed_summary:
-            source_detail_section += f"{src.detailed_summary}\n\n"
+            source_detail_parts.append(f"{src.detailed_summary}\n\n")
         elif src.short_summary:
-            source_detail_section += f"**Key Points:**\n{src.short_summary}\n\n"
+            source_detail_parts.append(f"**Key Points:**\n{src.short_summary}\n\n")
             if src.research_topics:
-                source_detail_section += f"**Suggested Research Topics:**\n{src.research_topics}\n\n"
+                source_detail_parts.append(f"**Suggested Research Topics:**\n{src.research_topics}\n\n")
         else:
-            source_detail_section += "*No detailed summary available.*\n\n"
+            source_detail_parts.append("*No detailed summary available.*\n\n")
             
-        source_detail_section += "---\n\n"
+        source_detail_parts.append("---\n\n")
     
     # Combine the main summary with the source details
-    complete_summary = main_summary + "\n\n" + source_detail_section
+    complete_summary = main_summary + "\n\n" + "".join(source_detail_parts)
     
     return complete_summary
 
+def _cached_source_summary(anthropic_client: Any, source: Source, research_task: Dict,
+                           cache: Optional[ResponseCache] = None) -> str:
+    """
+    Generate a detailed summary of a source, reusing a cached one when available.
+    
+    Args:
+        anthropic_client: Anthropic API client
+        source: Source object with content
+        research_task: Dictionary containing research task details
+        cache: Optional response cache
+        
+    Returns:
+        Detailed summary of the source
+    """
+    if cache is None:
+        return _generate_source_summary(anthropic_client, source, research_task)
+    
+    key = make_key("source-summary-v1", research_task, source.url, source.title,
+                   source.short_summary, source.content)
+    summary = cache.get("source_summary", key, ttl=SOURCE_SUMMARY_CACHE_TTL)
+    if summary is not None:
+        return summary
+    
+    summary = _generate_source_summary(anthropic_client, source, research_task)
+    # Fallback summaries produced after API errors are regenerated next time
+    if "due to API error" not in summary and not summary.startswith("### Chunk 1 Summary"):
+        cache.set("source_summary", key, summary)
+    return summary
+
+def _summary_token_budget(text: str, limit: int) -> int:
+    """
+    Choose max_tokens for summarizing a text, so short inputs do not reserve a large output budget.
+    
+    Args:
+        text: Text that is summarized
+        limit: Largest budget to return
+        
+    Returns:
+        Output token budget between MIN_SUMMARY_TOKENS and limit
+    """
+    return min(limit, max(MIN_SUMMARY_TOKENS, estimate_tokens(text) // 2))
+
+def _request_summary(anthropic_client: Any, text: str, limit: int, prompt: str,
+                     system: List[Dict]) -> str:
+    """
+    Request a summary of a text with an output budget scaled to the text's length.
+    
+    If the summary stops at the scaled budget, it is requested again with the
+    full limit so that it does not end mid-sentence.
+    
+    Args:
+        anthropic_client: Anthropic API client
+        text: Text that is summarized
+        limit: Largest output budget
+        prompt: User prompt containing the text
+        system: System prompt blocks
+        
+    Returns:
+        Generated summary
+    """
+    max_tokens = _summary_token_budget(text, limit)
+    while True:
+        response = anthropic_client.messages.create(
+            model=DEFAULT_SUMMARY_MODEL,
+            max_tokens=max_tokens,
+            temperature=0.1,
+            system=system,
+            messages=[
+                {"role": "user", "content": prompt}
+            ]
+        )
+        record_cache_usage(response.usage)
+        if response.stop_reason != "max_tokens" or max_tokens >= limit:
+            return response.content[0].text
+        max_tokens = limit
+
 def _generate_source_summary(anthropic_client: Any, source: Source, research_task: Dict) -> str:
     """
     Generate a detailed summary of a single large source.
@@ -241,97 +342,59 @@ def _generate_source_summary(anthropic_client: Any, source: Source, research_tas
         Exception: If there's an error generating the summary, provides a fallback
     """
     # For very large content, process in chunks
-    if len(source.content) > 20000:
-        # Split into chunks with overlap
-        chunk_size = 18000
-        overlap = 1000
-        chunks = []
+    if estimate_tokens(source.content) > SUMMARY_CHUNK_TOKENS:
+        # Split into chunks at sentence boundaries
+        chunks = split_into_token_chunks(source.content, SUMMARY_CHUNK_SIZE_TOKENS)
         
-        for i in range(0, len(source.content), chunk_size - overlap):
-            chunk = source.content[i:i + chunk_size]
-            chunks.append(chunk)
-        
-        # Generate summary for each chunk
-        chunk_summaries = []
-        for i, chunk in enumerate(chunks):
+        # Summarize the chunks in parallel; they are independent of each other
+        def summarize_chunk(i: int) -> str:
             print(f"Summarizing chunk {i+1}/{len(chunks)} for source: {source.title}")
+            chunk = chunks[i]
             
-            prompt = f"""
-            You are summarizing a portion of a document for research purposes.
-            
-            RESEARCH TASK:
-            {json.dumps(research_task, indent=2)}
-            
-            SOURCE:
-            Title: {source.title}
-            URL: {source.url}
-            
-            This is chunk {i+1} of {len(chunks)} from the document.
-            
-            DOCUMENT CHUNK CONTENT:
-            {chunk}
-            
-            Provide a comprehensive and detailed summary of the key information in this document chunk 
-            that is relevant to the research task. Be thorough in capturing facts, data, statistics, 
-            methodology, findings, conclusions, and insights. Include specific details where possible.
-            """
+            prompt = _CHUNK_SUMMARY_PROMPT.format(
+                title=source.title,
+                url=source.url,
+                number=i + 1,
+                count=len(chunks),
+                chunk=chunk
+            )
             
             try:
-                response = anthropic_client.messages.create(
-                    model="claude-3-5-haiku-20241022",
-                    max_tokens=3000,  # Increased from 2000
-                    temperature=0.1,
-                    system="You are a helpful research assistant extracting key information from documents.",
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ]
+                return _request_summary(
+                    anthropic_client, chunk, 3000, prompt,
+                    cached_system("You are a helpful research assistant extracting key information from documents.", research_task)
                 )
-                
-                chunk_summaries.append(response.content[0].text)
             except Exception as e:
                 print(f"Error summarizing chunk {i+1}: {e}")
                 # Provide a basic fallback summary for this chunk
-                fallback_summary = f"[Content from chunk {i+1} could not be summarized due to API error: {e}]"
-                chunk_summaries.append(fallback_summary)
+                return f"[Content from chunk {i+1} could not be summarized due to API error: {e}]"
+        
+        with ThreadPoolExecutor(max_workers=min(len(chunks), MAX_SUMMARY_WORKERS)) as executor:
+            chunk_summaries = list(executor.map(summarize_chunk, range(len(chunks))))
         
         # Combine chunk summaries
         combined_summary = "\n\n".join([f"--- Chunk {i+1} Summary ---\n{summary}" 
                                       for i, summary in enumerate(chunk_summaries)])
         
         # Generate a unified summary from the chunk summaries
-        final_prompt = f"""
-        You are creating a unified summary of a document based on summaries of different chunks.
-        
-        RESEARCH TASK:
-        {json.dumps(research_task, indent=2)}
-        
-        SOURCE:
-        Title: {source.title}
-        URL: {source.url}
-        
-        SHORT SUMMARY:
-        {source.short_summary if source.short_summary else "No short summary available."}
-        
-        CHUNK SUMMARIES:
-        {combined_summary}
-        
-        Create a comprehensive and detailed unified summary of this document that captures all the key 
-        information from the different chunks that is relevant to the research task. Include specific 
-        facts, figures, methodology, and conclusions. Be thorough while still eliminating redundancies 
-        and organizing the information logically. Your summary should be substantial enough to give readers
-        a complete understanding of the document's relevant content.
-        """
+        final_prompt = _UNIFIED_SOURCE_SUMMARY_PROMPT.format(
+            title=source.title,
+            url=source.url,
+            short_summary=source.short_summary or "No short summary available.",
+            chunk_summaries=combined_summary
+        )
         
         try:
             response = anthropic_client.messages.create(
-                model="claude-3-5-haiku-20241022",
+                model=DEFAULT_SUMMARY_MODEL,
                 max_tokens=4000,  # Increased from 2500
                 temperature=0.1,
-                system="You are a helpful research assistant creating unified document summaries.",
+                system=cached_system("You are a helpful research assistant creating unified document summaries.", research_task),
                 messages=[
                     {"role": "user", "content": final_prompt}
                 ]
             )
+            record_cache_usage(response.usage)
             
             return response.content[0].text
         except Exception as e:
@@ -341,41 +404,18 @@ def _generate_source_summary(anthropic_client: Any, source: Source, research_tas
                               for i, summary in enumerate(chunk_summaries)])
     else:
         # For content that fits within context window
-        prompt = f"""
-        You are summarizing a document for research purposes.
-        
-        RESEARCH TASK:
-        {json.dumps(research_task, indent=2)}
-        
-        SOURCE:
-        Title: {source.title}
-        URL: {source.url}
-        
-        SHORT SUMMARY:
-        {source.short_summary if source.short_summary else "No short summary available."}
-        
-        DOCUMENT CONTENT:
-        {source.content}
-        
-        Provide a comprehensive and detailed summary of the key information in this document
-        that is relevant to the research task. Be thorough in capturing facts, data, statistics, 
-        methodology, findings, conclusions, and insights. Include specific details where possible.
-        Your summary should be substantial enough to give readers a complete understanding of 
-        the document's relevant content.
-        """
+        prompt = _SOURCE_SUMMARY_PROMPT.format(
+            title=source.title,
+            url=source.url,
+            short_summary=source.short_summary or "No short summary available.",
+            content=source.content
+        )
         
         try:
-            response = anthropic_client.messages.create(
-                model="claude-3-5-haiku-20241022",
-                max_tokens=4000,  # Increased from 2500
-                temperature=0.1,
-                system="You are a helpful research assistant summarizing documents.",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+            return _request_summary(
+                anthropic_client, source.content, 4000, prompt,
+                cached_system("You are a helpful research assistant summarizing documents.", research_task)
             )
-            
-            return response.content[0].text
         except Exception as e:
             print(f"Error summarizing document: {e}")
             # Provide a basic fallback summary
@@ -3,26 +3,76 @@ Main WebResearchTool class that orchestrates the research process.
 """
 
 import os
+import hashlib
+import heapq
+import itertools
 import yaml
 import json
 import time
 import anthropic
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlparse
 from typing import List, Dict, Tuple, Set, Any, Optional
 from googleapiclient.discovery import build
 
+from .cache import ResponseCache, DEFAULT_CACHE_PATH
+from .claude import cache_usage
 from .models import SearchQuery, Source
+from .rate_limit import RateLimitedClient, TokenBucket
 from .search import google_search
-from .content_extraction import extract_content
-from .source_evaluation import evaluate_source_relevance
+from .content_extraction import extract_contents
+from .source_evaluation import evaluate_sources_relevance
 from .query_generation import generate_initial_queries, generate_follow_up_queries, extract_topics_from_sources
 from .summarization import summarize_findings
 from .output import save_source_content, prepare_for_claude
 
+# Use the LibYAML-based C loader when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Maximum number of previously executed queries passed to follow-up query generation
+MAX_PREVIOUS_QUERIES = 20
+
+# Number of failed content extractions after which a domain is skipped for the rest of a run
+MAX_DOMAIN_FAILURES = 2
+
+# Results fetched per free source slot in a search iteration. Some fetched results fail
+# extraction or score below the relevance threshold, so fetching only as many as there
+# are free slots would spend whole iterations of max_searches on a rejected result.
+FETCH_HEADROOM = 2
+
+# Query parameters that only track the referrer and do not change the page
+_TRACKING_PARAMS = ('utm_', 'gclid', 'fbclid', 'msclkid')
+
+def _normalize_url(url: str) -> str:
+    """
+    Normalize a URL for duplicate detection.
+    
+    The scheme and host are lowercased, and the fragment and tracking query
+    parameters (utm_*, gclid, ...) are dropped.
+    
+    Args:
+        url: URL to normalize
+        
+    Returns:
+        Normalized URL
+    """
+    parts = urlparse(url)
+    query = parts.query
+    if query:
+        query = '&'.join(param for param in query.split('&')
+                         if not param.lower().startswith(_TRACKING_PARAMS))
+    return parts._replace(scheme=parts.scheme.lower(), netloc=parts.netloc.lower(),
+                          query=query, fragment='').geturl()
+
 class WebResearchTool:
     def __init__(self, google_api_key: str, google_cse_id: str, anthropic_api_key: str, 
                  max_sources: int = 10, max_searches: int = 5, delay: float = 1.0,
-                 verbose: bool = False, generate_detailed_summaries: bool = True):
+                 verbose: bool = False, generate_detailed_summaries: bool = True,
+                 cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+                 anthropic_requests_per_minute: float = 50, search_concurrency: int = 1,
+                 synthesis_model: Optional[str] = None):
         """
         Initialize the web research tool with API keys and configuration.
         
@@ -35,24 +85,49 @@ class WebResearchTool:
             delay: Delay between API requests to avoid rate limiting
             verbose: Whether to print detailed progress information
             generate_detailed_summaries: Whether to generate detailed summaries for each source
+            cache_path: Path of the SQLite response cache, or None to disable caching
+            anthropic_requests_per_minute: Client-side limit on the Claude request rate
+            search_concurrency: Number of pending queries searched concurrently per iteration
+            synthesis_model: Optional Claude model for the final research summary; all other
+                requests use Claude 3.5 Haiku
         """
         self.google_api_key = google_api_key
         self.google_cse_id = google_cse_id
         self.anthropic_api_key = anthropic_api_key
         self.max_sources = max_sources
         self.max_searches = max_searches
+        self.search_concurrency = max(1, search_concurrency)
         self.delay = delay
         self.verbose = verbose
         self.generate_detailed_summaries = generate_detailed_summaries
+        self.synthesis_model = synthesis_model
         
-        # Initialize the Google Custom Search API client
-        self.google_service = build("customsearch", "v1", developerKey=self.google_api_key)
+        # Initialize the Google Custom Search API client from the discovery document bundled
+        # with the library, so no discovery request is made and no discovery cache is touched
+        self.google_service = build("customsearch", "v1", developerKey=self.google_api_key,
+                                    cache_discovery=False, static_discovery=True)
         
-        # Initialize the Anthropic Claude client
-        self.anthropic_client = anthropic.Anthropic(api_key=self.anthropic_api_key)
+        # Initialize the Anthropic Claude client, rate limited on the client side so that
+        # concurrent requests do not burst into the API rate limit
+        self.anthropic_client = RateLimitedClient(
+            anthropic.Anthropic(api_key=self.anthropic_api_key),
+            TokenBucket(anthropic_requests_per_minute / 60, burst=5)
+        )
+        
+        # Space out Google searches by the configured delay, letting a batch of concurrent
+        # searches start together
+        self.google_rate_limiter = (TokenBucket(1 / self.delay, burst=self.search_concurrency)
+                                    if self.delay > 0 else None)
+        
+        # Open the response cache shared across research runs
+        self.cache = ResponseCache(cache_path) if cache_path else None
         
         self.sources = []
-        self.search_queries = []
+        self._seen_urls = set()  # Normalized URLs already fetched, so they are never fetched or evaluated twice
+        self._content_hashes = set()  # Hashes of extracted page texts, so identical pages are evaluated once
+        self._domain_failures = Counter()  # Failed content extractions per domain
+        self.search_queries = []  # Heap of (-importance, insertion order, SearchQuery)
+        self._query_counter = itertools.count()
         self.completed_queries = set()  
         self.executed_query_strings = []  # New list to track executed query strings    
         
@@ -61,8 +136,12 @@ class WebResearchTool:
             print(f"Web Research Tool Configuration:")
             print(f"- Max sources: {self.max_sources}")
             print(f"- Max searches: {self.max_searches}")
+            print(f"- Concurrent searches: {self.search_concurrency}")
             print(f"- Request delay: {self.delay}s")
             print(f"- Generate detailed summaries: {self.generate_detailed_summaries}")
+            if self.synthesis_model:
+                print(f"- Research summary model: {self.synthesis_model}")
+            print(f"- Response cache: {cache_path if cache_path else 'disabled'}")
             print(f"- Google CSE ID: {self.google_cse_id[:5]}...{self.google_cse_id[-5:]}")
             print(f"- Using Anthropic API key: {self.anthropic_api_key[:5]}...{self.anthropic_api_key[-5:]}")
     
@@ -77,7 +156,7 @@ class WebResearchTool:
             Dictionary with parsed research parameters
         """
         try:
-            research_request = yaml.safe_load(yaml_request)
+            research_request = yaml.load(yaml_request, Loader=_YAML_LOADER)
             return research_request
         except yaml.YAMLError as e:
             raise ValueError(f"Error parsing YAML request: {e}")
@@ -108,79 +187,127 @@ class WebResearchTool:
         
         print(f"Starting research on: {research_task.get('topic', 'Research Topic')}")
         
-        # Generate initial search queries
-        self.search_queries = generate_initial_queries(self.anthropic_client, research_task)
-        print(f"Generated {len(self.search_queries)} initial search queries")
-        
-        # Sort queries by importance
-        self.search_queries.sort(key=lambda q: q.importance, reverse=True)
+        # Generate initial search queries, kept in a heap ordered by importance
+        initial_queries = generate_initial_queries(self.anthropic_client, research_task, cache=self.cache)
+        print(f"Generated {len(initial_queries)} initial search queries")
+        self.search_queries = []
+        for query in initial_queries:
+            self._push_query(query)
         
         search_iteration = 0
         while search_iteration < self.max_searches and self.search_queries:
-            # Get the next query
-            current_query = self.search_queries.pop(0)
+            # Stop searching once we have enough sources
+            remaining_slots = self.max_sources - len(self.sources)
+            if remaining_slots <= 0:
+                break
             
-            # Skip if we've already processed this query
-            query_key = f"{current_query.query}:{current_query.site_restrict}"
-            if query_key in self.completed_queries:
-                continue
+            # Take the most important remaining queries that have not run yet, up to
+            # search_concurrency of them, and search them concurrently
+            batch = []
+            batch_keys = set()
+            batch_size = min(self.search_concurrency, self.max_searches - search_iteration)
+            while self.search_queries and len(batch) < batch_size:
+                query = heapq.heappop(self.search_queries)[2]
+                # Skip if we've already processed this query
+                if query.key in self.completed_queries or query.key in batch_keys:
+                    continue
+                batch.append(query)
+                batch_keys.add(query.key)
+            if not batch:
+                break
             
-            print(f"\nExecuting search query ({search_iteration + 1}/{self.max_searches}): {current_query.query}")
-            if current_query.site_restrict:
-                print(f"Site restriction: {current_query.site_restrict}")
+            for i, current_query in enumerate(batch):
+                print(f"\nExecuting search query ({search_iteration + i + 1}/{self.max_searches}): {current_query.query}")
+                if current_query.site_restrict:
+                    print(f"Site restriction: {current_query.site_restrict}")
+                
+                # Store the query string in our list of executed queries
+                self.executed_query_strings.append(current_query.query)  
             
-            # Store the query string in our list of executed queries
-            self.executed_query_strings.append(current_query.query)  
-            # Perform the search
-            search_results = google_search(
-                self.google_service, 
-                self.google_cse_id,
-                current_query.query, 
-                current_query.site_restrict,
-                delay=self.delay
-            )
-            print(f"Found {len(search_results)} results")
+            # Perform the searches
+            with ThreadPoolExecutor(max_workers=len(batch)) as executor:
+                batch_results = list(executor.map(
+                    lambda query: google_search(
+                        self.google_service, 
+                        self.google_cse_id,
+                        query.query, 
+                        query.site_restrict,
+                        delay=self.delay,
+                        cache=self.cache,
+                        rate_limiter=self.google_rate_limiter
+                    ),
+                    batch
+                ))
             
-            # Process each search result
-            for result in search_results[:5]:  # Limit to top 5 results per query
+            # Collect the new results of all queries, fetching a few more than we have room for
+            # since evaluation rejects some of them
+            max_new_results = remaining_slots * FETCH_HEADROOM
+            new_results = []
+            for search_results in batch_results:
+                print(f"Found {len(search_results)} results")
+                for result in search_results[:5]:  # Limit to top 5 results per query
+                    if len(new_results) >= max_new_results:
+                        break
+                    url = result.get('link')
+                    
+                    # Skip URLs we have already fetched, whether or not they were relevant
+                    normalized_url = _normalize_url(url)
+                    if normalized_url in self._seen_urls:
+                        continue
+                    self._seen_urls.add(normalized_url)
+                    
+                    # Skip domains that keep failing (paywalls, bot blockers, timeouts)
+                    if self._domain_failures[urlparse(normalized_url).netloc] >= MAX_DOMAIN_FAILURES:
+                        print(f"Skipping {url}: content extraction keeps failing for this domain")
+                        continue
+                    
+                    new_results.append(result)
+            
+            # Fetch the content of all new results concurrently
+            contents = extract_contents([result.get('link') for result in new_results], cache=self.cache)
+            
+            # Create source objects for the results we could extract
+            fetched_sources = []
+            for result, (content, content_type) in zip(new_results, contents):
                 url = result.get('link')
-                
-                # Skip if we already have this source
-                if any(s.url == url for s in self.sources):
-                    continue
-                
                 print(f"Processing: {url}")
                 
-                # Create a source object
-                source = Source(
-                    url=url,
-                    title=result.get('title', 'No title'),
-                    snippet=result.get('snippet', 'No snippet')
-                )
-                
-                # Extract the content
-                content, content_type = extract_content(url)
-                source.content = content
-                source.content_type = content_type
-                
                 # Skip if we couldn't extract content
                 if 'ERROR' in content:
                     print(f"Skipping due to extraction error")
+                    self._domain_failures[urlparse(_normalize_url(url)).netloc] += 1
                     continue
                 
-                # Evaluate relevance and get short summary and research topics
-                relevance_score, short_summary, research_topics = evaluate_source_relevance(
-                    self.anthropic_client, 
-                    source, 
-                    research_task,
-                    self.verbose
-                )
+                # Skip pages whose text we already have under another URL (mirrors, redirects)
+                content_hash = hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+                if content_hash in self._content_hashes:
+                    print("Skipping duplicate of an already fetched page")
+                    continue
+                self._content_hashes.add(content_hash)
                 
+                fetched_sources.append(Source(
+                    url=url,
+                    title=result.get('title', 'No title'),
+                    snippet=result.get('snippet', 'No snippet'),
+                    content=content,
+                    content_type=content_type
+                ))
+            
+            # Evaluate relevance and get short summaries and research topics concurrently
+            evaluations = evaluate_sources_relevance(
+                self.anthropic_client,
+                fetched_sources,
+                research_task,
+                self.verbose,
+                cache=self.cache
+            )
+            
+            for source, (relevance_score, short_summary, research_topics) in zip(fetched_sources, evaluations):
                 source.relevance_score = relevance_score
                 source.short_summary = short_summary
                 source.research_topics = research_topics
                 
-                print(f"Relevance score: {source.relevance_score}")
+                print(f"Relevance score: {source.relevance_score} ({source.url})")
                 
                 # Add to our sources if it's relevant enough
                 if source.relevance_score >= 0.5:
@@ -195,20 +322,24 @@ class WebResearchTool:
                 if len(self.sources) >= self.max_sources:
                     break
             
-            # Mark this query as completed
-            self.completed_queries.add(query_key)
+            # Mark these queries as completed
+            self.completed_queries.update(batch_keys)
+            search_iteration += len(batch)
                         
             # Generate follow-up queries if needed
-            if len(self.sources) < self.max_sources and search_iteration < self.max_searches - 1:
-                # Use our list of executed query strings directly
-                previous_queries = self.executed_query_strings
+            if len(self.sources) < self.max_sources and search_iteration < self.max_searches:
+                # Use our list of executed query strings directly, without repeats (the same
+                # query may have run with different site restrictions), keeping only the most
+                # recent ones so the prompt stays small on long runs
+                previous_queries = list(dict.fromkeys(self.executed_query_strings))[-MAX_PREVIOUS_QUERIES:]
                 
                 # Get follow-up queries based on sources including their short summaries and research topics
                 follow_up_queries = generate_follow_up_queries(
                     self.anthropic_client,
                     research_task, 
                     self.sources,
-                    previous_queries
+                    previous_queries,
+                    cache=self.cache
                 )   
            
                 
@@ -224,29 +355,21 @@ class WebResearchTool:
                 
                 # Add new queries to our list
                 for query in follow_up_queries:
-                    query_key = f"{query.query}:{query.site_restrict}"
-                    if query_key not in self.completed_queries:
-                        self.search_queries.append(query)
-                
-                # Re-sort queries by importance
-                self.search_queries.sort(key=lambda q: q.importance, reverse=True)
+                    if query.key not in self.completed_queries:
+                        self._push_query(query)
                 
                 print(f"Generated {len(follow_up_queries)} follow-up queries")
-            
-            search_iteration += 1
-        
-        # Sort sources by relevance
-        self.sources.sort(key=lambda s: s.relevance_score, reverse=True)
         
-        # Keep only the top sources
-        self.sources = self.sources[:self.max_sources]
+        # Keep only the top sources, sorted by relevance
+        self.sources = heapq.nlargest(self.max_sources, self.sources, key=lambda s: s.relevance_score)
         
         print(f"\nResearch completed. Found {len(self.sources)} relevant sources.")
         
         # Generate detailed summaries if enabled
         if self.generate_detailed_summaries:
             print("Generating detailed research summary...")
-            summary = summarize_findings(self.anthropic_client, research_task, self.sources, self.verbose)
+            summary = summarize_findings(self.anthropic_client, research_task, self.sources, self.verbose,
+                                         cache=self.cache, synthesis_model=self.synthesis_model)
         else:
             print("Generating basic research summary with short bullet points...")
             # Use the short summaries already generated during evaluation
@@ -266,8 +389,25 @@ class WebResearchTool:
         
         print(f"Research output saved to {output_file}")
         
+        if self.verbose:
+            # No cache reads means the stable prompt prefix is shorter than Claude's minimum cacheable length
+            usage = cache_usage()
+            print(f"Prompt cache: {usage['read']} input tokens read, {usage['written']} written")
+        
         return output_text, file_paths
     
+    def _push_query(self, query: SearchQuery):
+        """
+        Add a query to the queue of pending searches.
+        
+        Queries are popped in order of decreasing importance; queries of equal
+        importance are popped in the order they were added.
+        
+        Args:
+            query: Search query to add
+        """
+        heapq.heappush(self.search_queries, (-query.importance, next(self._query_counter), query))
+    
     def _generate_basic_summary(self, research_task: Dict) -> str:
         """
         Generate a basic summary using the short summaries already collected.
@@ -294,14 +434,10 @@ class WebResearchTool:
         for source in self.sources:
             if source.research_topics:
                 # Split by bullet points and clean up
-                topics = [t.strip() for t in source.research_topics.replace('•', '').split('\n') if t.strip()]
-                all_topics.extend(topics)
+                all_topics.extend(source.topic_list())
         
         # Remove duplicates while preserving order
-        unique_topics = []
-        for topic in all_topics:
-            if topic not in unique_topics:
-                unique_topics.append(topic)
+        unique_topics = list(dict.fromkeys(all_topics))
         
         if unique_topics:
             summary.append("\n## Suggested Further Research\n")